@@ -0,0 +1,38 @@
+"""
+This file was autogenerated by Alembic.
+
+Revision ID: 6a0e5c2d9f13
+Revises: 1f7c3a9e8b42
+Create Date: 2026-10-19 01:12:36.471520
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '6a0e5c2d9f13'
+down_revision: str | None = '1f7c3a9e8b42'
+branch_labels: "str | Sequence[str] | None" = None
+depends_on: "str | Sequence[str] | None" = None
+
+
+def upgrade() -> None:
+    """
+    user directory search
+    """
+    # fails if two existing users share an email up to case, which has to be resolved
+    # by hand first
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE UNIQUE INDEX ix_users_email_lower ON users (lower(email))")
+    op.execute(
+        "CREATE INDEX ix_users_email_lower_prefix ON users "
+        '(lower(email) COLLATE "C")'
+    )
+    op.execute(
+        "CREATE INDEX ix_users_email_lower_trgm ON users "
+        "USING gin (lower(email) gin_trgm_ops)"
+    )
+    op.drop_index('ix_users_email', table_name='users')
+
+
+def downgrade() -> None:
+    pass
@@ -0,0 +1,56 @@
+"""
+This file was autogenerated by Alembic.
+
+Revision ID: 8c2f4e1a7b39
+Revises: 6a0e5c2d9f13
+Create Date: 2026-10-19 03:26:14.905318
+"""
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2f4e1a7b39'
+down_revision: str | None = '6a0e5c2d9f13'
+branch_labels: "str | Sequence[str] | None" = None
+depends_on: "str | Sequence[str] | None" = None
+
+# every column holding key material, and whether it is nullable
+KEY_COLUMNS = [
+    ('users', 'encryption_key', False),
+    ('users', 'encryption_key_salt', False),
+    ('items', 'content_nonce', True),
+    ('segments', 'nonce', False),
+    ('variants', 'nonce', False),
+    ('groupings', 'encryption_key', False),
+    ('sharings', 'encryption_key', False),
+    ('sharings', 'encryption_key_nonce', False),
+    ('uploads', 'content_nonce', False),
+    ('uploads', 'encryption_key', False),
+    ('uploads', 'encryption_key_nonce', False),
+    ('staged_groupings', 'encryption_key', False),
+    ('staged_sharings', 'encryption_key', False),
+    ('staged_sharings', 'encryption_key_nonce', False),
+]
+
+
+def upgrade() -> None:
+    """
+    binary keys
+    """
+    # clients encode key material without padding, which decode() insists on
+    for table, column, nullable in KEY_COLUMNS:
+        op.alter_column(table, column,
+                   existing_type=sa.String(),
+                   type_=postgresql.BYTEA(),
+                   existing_nullable=nullable,
+                   postgresql_using=(
+                       f"decode(rpad({column}, (length({column}) + 3) / 4 * 4, '='), "
+                       "'base64')"
+                   ))
+
+
+def downgrade() -> None:
+    pass
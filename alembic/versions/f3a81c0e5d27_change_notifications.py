@@ -0,0 +1,48 @@
+"""
+This file was autogenerated by Alembic.
+
+Revision ID: f3a81c0e5d27
+Revises: c20172ad7088
+Create Date: 2026-10-18 22:02:47.318904
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a81c0e5d27'
+down_revision: str | None = 'c20172ad7088'
+branch_labels: "str | Sequence[str] | None" = None
+depends_on: "str | Sequence[str] | None" = None
+
+
+def upgrade() -> None:
+    """
+    change notifications
+    """
+    # announce every change on the "changes" channel once its transaction commits
+    op.execute(
+        """
+        CREATE FUNCTION notify_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('changes', json_build_object(
+                'kind', NEW.kind,
+                'op', NEW.op,
+                'item_id', NEW.item_id,
+                'group_id', NEW.group_id,
+                'user_id', NEW.user_id
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER changes_notify AFTER INSERT ON changes
+        FOR EACH ROW EXECUTE FUNCTION notify_change()
+        """
+    )
+
+
+def downgrade() -> None:
+    pass
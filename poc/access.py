@@ -0,0 +1,112 @@
+"""
+Maintenance of the user → item access index. Every change to the graph of groupings
+and sharings is mirrored into `accesses` in the same transaction, so that access
+checks and visible-item listings are single index probes instead of joins.
+
+The index can be checked for drift, and rebuilt from scratch, from the command line:
+
+    python -m poc.access verify
+    python -m poc.access rebuild
+"""
+
+import asyncio
+import sys
+from collections.abc import Collection
+
+from sqlalchemy import delete, except_, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import create_session
+from .models import Access, Grouping, Sharing
+
+# every access implied by the current groupings and sharings
+_derived = (
+    select(Grouping.user_id, Sharing.item_id, Sharing.group_id)
+    .join(Sharing, Sharing.group_id == Grouping.group_id)
+    .distinct()
+)
+
+
+async def grant_membership(session: AsyncSession, user_id: int, group_id: int):
+    await grant_memberships(session, [user_id], group_id)
+
+
+async def grant_memberships(
+    session: AsyncSession, user_ids: Collection[int], group_id: int
+):
+    # new members can see everything shared with the group
+    await session.execute(
+        insert(Access)
+        .from_select(
+            ["user_id", "item_id", "via_group_id"],
+            _derived.where(
+                Grouping.user_id.in_(user_ids), Grouping.group_id == group_id
+            ),
+        )
+        .on_conflict_do_nothing()
+    )
+
+
+async def revoke_membership(session: AsyncSession, user_id: int, group_id: int):
+    await session.execute(
+        delete(Access).where(Access.user_id == user_id, Access.via_group_id == group_id)
+    )
+
+
+async def grant_sharing(session: AsyncSession, item_id: int, group_id: int):
+    # every member of the group can see a newly shared item
+    await session.execute(
+        insert(Access)
+        .from_select(
+            ["user_id", "item_id", "via_group_id"],
+            _derived.where(Sharing.item_id == item_id, Sharing.group_id == group_id),
+        )
+        .on_conflict_do_nothing()
+    )
+
+
+async def revoke_sharing(session: AsyncSession, item_id: int, group_id: int):
+    await session.execute(
+        delete(Access).where(Access.item_id == item_id, Access.via_group_id == group_id)
+    )
+
+
+async def verify(session: AsyncSession) -> tuple[int, int]:
+    """
+    Compare the index against the groupings and sharings it is derived from, and
+    return the number of missing and stale accesses.
+    """
+    actual = select(Access.user_id, Access.item_id, Access.via_group_id)
+    missing = await session.execute(
+        select(func.count()).select_from(except_(_derived, actual).subquery())
+    )
+    stale = await session.execute(
+        select(func.count()).select_from(except_(actual, _derived).subquery())
+    )
+    return missing.scalar_one(), stale.scalar_one()
+
+
+async def rebuild(session: AsyncSession):
+    """Replace the entire index with the accesses derived from the current graph."""
+    await session.execute(delete(Access))
+    await session.execute(
+        insert(Access).from_select(["user_id", "item_id", "via_group_id"], _derived)
+    )
+
+
+async def main(command: str) -> int:
+    async with create_session() as session:
+        if command == "rebuild":
+            await rebuild(session)
+            await session.commit()
+
+        missing, stale = await verify(session)
+        print(f"{missing} missing, {stale} stale")
+        return 1 if missing or stale else 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] not in (["verify"], ["rebuild"]):
+        sys.exit("usage: python -m poc.access {verify,rebuild}")
+    sys.exit(asyncio.run(main(sys.argv[1])))
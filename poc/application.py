@@ -1,22 +1,114 @@
-import itertools
+import asyncio
+import json
+import logging
+import struct
+from collections.abc import AsyncIterator, Awaitable, Callable
 from contextlib import asynccontextmanager
+from datetime import UTC, datetime, timedelta
 from os import scandir
-from typing import Annotated
-
-from fastapi import FastAPI, Form, HTTPException, UploadFile, status
-from fastapi.responses import StreamingResponse
+from secrets import token_urlsafe
+from typing import Annotated, Literal, get_args
+
+from fastapi import (
+    Depends,
+    FastAPI,
+    Form,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from sqlalchemy import delete, func, select
-
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import (
+    Integer,
+    LargeBinary,
+    Row,
+    column,
+    delete,
+    exists,
+    func,
+    insert,
+    literal,
+    select,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import access, changes, events
+from .cache import (
+    MISSING,
+    CachedContent,
+    create_content_cache,
+    create_directory_cache,
+    create_lookup_cache,
+)
+from .conditional import (
+    blob_etag,
+    make_etag,
+    matches,
+    not_modified,
+    strongly_matches,
+)
 from .db import SessionDependency, create_session
-from .models import Group, Grouping, Item, Sharing, User
+from .limits import ContentLengthLimit
+from .models import (
+    Access,
+    Change,
+    Group,
+    Grouping,
+    Item,
+    Rotation,
+    Segment,
+    Sharing,
+    StagedGrouping,
+    StagedSharing,
+    Upload,
+    UploadChunk,
+    User,
+    Variant,
+)
+from .ranges import CHUNK_SIZE, coalesce, content_response, slices
+from .schemas import (
+    Binary,
+    FeedItemSchema,
+    GroupingSchema,
+    GroupSchema,
+    ItemSchema,
+    MembershipSchema,
+    PublicUserSchema,
+    SegmentSchema,
+    SharingSchema,
+    UserSchema,
+    VariantSchema,
+)
+from .serialization import EncodingDependency, JSONResponse, dumps
+from .storage import (
+    BLOB_ROOT,
+    MAX_BLOB_SIZE,
+    BlobStore,
+    BlobStoreDependency,
+    create_blob_store,
+    ingest,
+    ingest_partial,
+    iter_upload,
+)
+from .streaming import ndjson_response
 
 WORLD_GROUP_ID: int = 1
 
+logger = logging.getLogger(__name__)
 
-@asynccontextmanager
-async def create_default_groups(_: FastAPI):
+
+async def create_default_groups():
     # DEBUG ONLY
     # ensure that the first group that exits in the application is World
     async with create_session() as session:
@@ -25,57 +117,288 @@ async def create_default_groups(_: FastAPI):
             session.add(Group(host_user_id=None, name="World", private=False))
             await session.commit()
 
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await create_default_groups()
+
+    # discard abandoned uploads and old changes in the background, and push changes
+    # to subscribers as they happen
+    tasks = [
+        asyncio.create_task(periodically(expire_uploads, UPLOAD_SWEEP_INTERVAL)),
+        asyncio.create_task(periodically(compact_changes, COMPACTION_INTERVAL)),
+        asyncio.create_task(events.create_broker().run()),
+    ]
+    events.create_broker().watch(invalidate_caches)
     yield
+    for task in tasks:
+        task.cancel()
+
+
+async def periodically(job: Callable[[], Awaitable[None]], interval: float):
+    # run a maintenance job forever, surviving its failures
+    while True:
+        try:
+            await job()
+        except Exception:
+            logger.exception("failed to run %s", job.__name__)
+
+        await asyncio.sleep(interval)
+
+
+def invalidate_caches(event: dict):
+    # drop whatever was cached about anything that changed in any process
+    if event["type"] == "resync":
+        create_content_cache().clear()
+        create_lookup_cache().clear()
+    elif event["kind"] == "item":
+        create_content_cache().invalidate(event["item_id"])
+    elif event["kind"] == "sharing":
+        forget_sharing(event["item_id"], event["group_id"])
+    elif event["kind"] == "grouping":
+        forget_grouping(event["user_id"], event["group_id"])
+
+
+def forget_sharing(item_id: int, group_id: int):
+    create_lookup_cache().invalidate(("sharing", item_id, group_id))
+
+
+def forget_grouping(user_id: int, group_id: int):
+    create_lookup_cache().invalidate(
+        ("grouping", user_id, group_id), ("memberships", user_id)
+    )
+
+
+app = FastAPI(lifespan=lifespan, debug=True, default_response_class=JSONResponse)
+
+EncodedBytes = Annotated[Binary, Form()]
+IfNoneMatch = Annotated[str | None, Header(alias="If-None-Match")]
+IfRange = Annotated[str | None, Header(alias="If-Range")]
+IfMatch = Annotated[str | None, Header(alias="If-Match")]
 
+# the variants an item may have, besides its content
+VariantName = Literal["thumb", "preview"]
 
-app = FastAPI(lifespan=create_default_groups, debug=True)
 
-EncodedBytes = Annotated[str, Form()]
+class VariantUploads:
+    """
+    The variants uploaded alongside an item's content, each with its own nonce. a
+    variant name added to `VariantName` gets its form fields here
+    """
+
+    def __init__(
+        self,
+        thumb: UploadFile | None = None,
+        thumb_nonce: Annotated[Binary | None, Form()] = None,
+        preview: UploadFile | None = None,
+        preview_nonce: Annotated[Binary | None, Form()] = None,
+    ):
+        self.uploads: dict[VariantName, tuple[UploadFile | None, bytes | None]] = {
+            "thumb": (thumb, thumb_nonce),
+            "preview": (preview, preview_nonce),
+        }
+
+
+VariantUploadsDependency = Annotated[VariantUploads, Depends()]
 
 ##
 ## USERS
 ##
 
+USER_COLUMNS = (
+    User.id,
+    User.email,
+    User.encryption_key,
+    User.encryption_key_salt,
+    User.private_group_id,
+)
+
 
 #### create
-@app.post("/create_user")
+@app.post("/create_user", response_model=UserSchema)
 async def create_user(
     email: Annotated[str, Form()],
     encryption_key: EncodedBytes,
     encryption_key_salt: EncodedBytes,
     session: SessionDependency,
 ):
-    # create user
-    u = User(
-        email=email,
-        encryption_key=encryption_key,
-        encryption_key_salt=encryption_key_salt,
-    )
-    session.add(u)
+    # create user, reading it back in the same round trip. emails are unique
+    # regardless of case
+    try:
+        result = await session.execute(
+            insert(User)
+            .values(
+                email=email,
+                encryption_key=encryption_key,
+                encryption_key_salt=encryption_key_salt,
+            )
+            .returning(*USER_COLUMNS)
+        )
+    except IntegrityError:
+        raise HTTPException(status.HTTP_409_CONFLICT) from None
+    u = result.one()._asdict()
     await session.commit()
-    await session.refresh(u)
     return u
 
 
 #### read
-@app.get("/get_user")
-async def get_user(email: str, session: SessionDependency):
+@app.get("/get_user", response_model=UserSchema)
+async def get_user(
+    email: str,
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+):
     # get user by id
-    user = await session.execute(select(User).where(User.email == email).limit(1))
+    user = await session.execute(
+        select(User).where(func.lower(User.email) == email.lower()).limit(1)
+    )
     try:
-        return user.scalar_one()
+        u = user.scalar_one()
     except Exception as e:
         raise HTTPException(status.HTTP_403_FORBIDDEN) from None
+    return encoding.respond(UserSchema, u, response)
 
 
 #### read
-@app.get("/get_users")
+@app.get("/get_users", response_model=list[UserSchema])
 async def get_users(session: SessionDependency):
     # DEBUG ONLY
     user = await session.execute(select(User))
     return user.scalars().all()
 
 
+#### read
+@app.get("/stream_users")
+async def stream_users():
+    # stream every user as newline-delimited JSON, for exports and admin tooling
+    return ndjson_response(select(*USER_COLUMNS).order_by(User.id))
+
+
+# the fields of a user anyone may see
+PUBLIC_USER_COLUMNS = (User.id, User.email, User.encryption_key)
+
+# largest page of search results that can be requested at once
+MAX_SEARCH_LIMIT: int = 50
+
+# shortest query a substring search accepts. shorter ones can't use trigrams
+MIN_CONTAINS_QUERY: int = 3
+
+
+class SearchUsersResult(BaseModel):
+    users: list[PublicUserSchema]
+    next: str | None
+
+
+#### read
+@app.get("/search_users", response_model=SearchUsersResult)
+async def search_users(
+    query: Annotated[str, Query(min_length=1)],
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+    mode: Literal["prefix", "contains"] = "prefix",
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_SEARCH_LIMIT)] = 20,
+):
+    # search users by email, ignoring case, for type-ahead pickers. prefix searches
+    # walk the byte-ordered email index, and substring searches use the trigram
+    # index. pages are keyed by the last email seen
+    email = func.lower(User.email)
+    ordered = email.collate("C")
+    if mode == "prefix":
+        condition = ordered.startswith(query.lower(), autoescape=True)
+    elif len(query) < MIN_CONTAINS_QUERY:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY)
+    else:
+        condition = email.contains(query.lower(), autoescape=True)
+
+    statement = (
+        select(*PUBLIC_USER_COLUMNS).where(condition).order_by(ordered).limit(limit + 1)
+    )
+    if after:
+        statement = statement.where(ordered > after.lower())
+
+    rows = (await session.execute(statement)).all()
+    page = rows[:limit]
+    cursor = page[-1].email.lower() if len(rows) > limit else None
+    return encoding.respond(
+        SearchUsersResult, {"users": page, "next": cursor}, response
+    )
+
+
+# most emails and user ids that can be resolved at once
+MAX_DIRECTORY_LOOKUPS: int = 1_000
+
+
+class FindUsersParams(BaseModel):
+    emails: list[str] = []
+    user_ids: list[int] = []
+
+
+class MissingUsers(BaseModel):
+    emails: list[str]
+    user_ids: list[int]
+
+
+class FindUsersResult(BaseModel):
+    users: list[PublicUserSchema]
+    missing: MissingUsers
+
+
+#### read
+@app.post("/find_users", response_model=FindUsersResult)
+async def find_users(
+    params: FindUsersParams,
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+):
+    # resolve many emails and user ids to public keys in a single query. public keys
+    # never change, so users found once are served from the directory cache
+    # afterwards. anything that doesn't resolve is reported as missing
+    emails = list(dict.fromkeys(email.lower() for email in params.emails))
+    user_ids = list(dict.fromkeys(params.user_ids))
+    if len(emails) + len(user_ids) > MAX_DIRECTORY_LOOKUPS:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    directory = create_directory_cache()
+    by_email = {email: directory.get(("email", email)) for email in emails}
+    by_id = {user_id: directory.get(("id", user_id)) for user_id in user_ids}
+    unknown_emails = [email for email, user in by_email.items() if user is MISSING]
+    unknown_ids = [user_id for user_id, user in by_id.items() if user is MISSING]
+    if unknown_emails or unknown_ids:
+        generation = directory.generation
+        result = await session.execute(
+            select(*PUBLIC_USER_COLUMNS).where(
+                func.lower(User.email).in_(unknown_emails) | User.id.in_(unknown_ids)
+            )
+        )
+        for row in result:
+            user = PublicUserSchema.model_validate(row)
+            email = user.email.lower()
+            directory.put(("email", email), user, generation)
+            directory.put(("id", user.id), user, generation)
+            if email in by_email:
+                by_email[email] = user
+            if user.id in by_id:
+                by_id[user.id] = user
+
+    users: dict[int, PublicUserSchema] = {}
+    for user in [*by_email.values(), *by_id.values()]:
+        if user is not MISSING:
+            users.setdefault(user.id, user)
+
+    found = {
+        "users": list(users.values()),
+        "missing": {
+            "emails": [email for email, user in by_email.items() if user is MISSING],
+            "user_ids": [user_id for user_id, user in by_id.items() if user is MISSING],
+        },
+    }
+    return encoding.respond(FindUsersResult, found, response)
+
+
 ##
 ## ITEMS
 ##
@@ -90,268 +413,1766 @@ async def create_item(
     content_nonce: EncodedBytes,
     content: UploadFile,
     session: SessionDependency,
+    blobs: BlobStoreDependency,
+    variant_uploads: VariantUploadsDependency,
 ):
-    # create item
-    i = Item(content=await content.read(), content_nonce=content_nonce)
+    # stream the encrypted content, and any separately encrypted variants uploaded
+    # alongside it, into the store. then create the item pointing at them
+    digests: list[str] = []
+    try:
+        digest, size = await ingest(iter_upload(content), blobs)
+        digests.append(digest)
+        variants = await ingest_variants(variant_uploads.uploads, blobs, digests)
+
+        i = Item(content_nonce=content_nonce, size=size, digest=digest)
+        item_id, private_group_id = await add_item(
+            session, owner_user_id, i, encryption_key, encryption_key_nonce
+        )
+        await store_variants(item_id, variants, session)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        for digest in digests:
+            await release_blob(digest, session, blobs)
+        raise
+    forget_sharing(item_id, private_group_id)
+
+    return item_id
+
+
+async def add_item(
+    session: AsyncSession,
+    owner_user_id: int,
+    i: Item,
+    encryption_key: bytes,
+    encryption_key_nonce: bytes,
+) -> tuple[int, int]:
+    # create item, returning its id and the private group it is shared with. the
+    # caller commits, and forgets that sharing once it has
     session.add(i)
-    await session.commit()
+    await session.flush()
+    item_id = i.id
 
-    # get private group
-    # TODO distinguish between private group and regular hosted group
+    # create sharing between the owner's private group and new item
     result = await session.execute(
-        select(Group.id).where(Group.host_user_id == owner_user_id).limit(1)
+        insert(Sharing)
+        .from_select(
+            ["group_id", "item_id", "encryption_key", "encryption_key_nonce"],
+            select(
+                User.private_group_id,
+                literal(item_id),
+                literal(encryption_key),
+                literal(encryption_key_nonce),
+            ).where(User.id == owner_user_id),
+        )
+        .returning(Sharing.group_id)
     )
     private_group_id = result.scalar_one()
-
-    # create sharing between private group and new item
-    session.add(
-        Sharing(
-            group_id=private_group_id,
-            item_id=await i.awaitable_attrs.id,
-            encryption_key=encryption_key,
-            encryption_key_nonce=encryption_key_nonce,
-        )
+    await access.grant_sharing(session, item_id, private_group_id)
+    await changes.record(session, "item", "create", item_id=item_id)
+    await changes.record(
+        session, "sharing", "create", item_id=item_id, group_id=private_group_id
     )
-    await session.commit()
 
-    return await i.awaitable_attrs.id
+    return item_id, private_group_id
+
+
+# every column of an item except its (potentially huge) content
+ITEM_METADATA = (
+    Item.id,
+    Item.content_nonce,
+    Item.size,
+    Item.digest,
+    Item.created_at,
+    Item.updated_at,
+    Item.segment_size,
+)
 
 
 #### read
-@app.get("/get_items")
-async def get_items(session: SessionDependency):
-    # get all item ids
-    result = await session.execute(select(Item))
-    return [
-        {"id": item.id, "content_nonce": item.content_nonce}
-        for item in result.scalars().all()
-    ]
+@app.get("/get_items", response_model=list[ItemSchema])
+async def get_items(
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+    if_none_match: IfNoneMatch = None,
+):
+    # get the metadata of all items
+    etag = encoding.etag(make_etag("items", await changes.version(session, "items")))
+    if matches(if_none_match, etag):
+        return not_modified(etag)
+
+    result = await session.execute(select(*ITEM_METADATA).order_by(Item.id))
+    response.headers["ETag"] = etag
+    return encoding.respond(list[ItemSchema], result.all(), response)
 
 
 #### read
-@app.get("/get_item")
-async def get_item(item_id: int, session: SessionDependency):
-    # get item by id
-    item = await session.get(Item, item_id)
-    return {"id": item.id, "content_nonce": item.content_nonce}
+@app.get("/stream_items")
+async def stream_items():
+    # stream the metadata of every item as newline-delimited JSON, for exports and
+    # admin tooling
+    return ndjson_response(select(*ITEM_METADATA).order_by(Item.id))
 
 
 #### read
-@app.get("/view_item")
-async def view_item(item_id: int, session: SessionDependency):
-    # streaming return item content as bytes to avoid massive payloads
-    item = await session.get(Item, item_id)
+@app.get("/get_item", response_model=ItemSchema)
+async def get_item(
+    item_id: int,
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+    if_none_match: IfNoneMatch = None,
+):
+    # get item metadata by id
+    result = await session.execute(select(*ITEM_METADATA).where(Item.id == item_id))
+    item = result.one_or_none()
+    if not item:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
 
-    def item_chunks():
-        it = iter(item.content)
-        for batch in iter(lambda: bytes(itertools.islice(it, 200)), b""):
-            yield batch
+    etag = encoding.etag(make_etag(*item))
+    if matches(if_none_match, etag):
+        return not_modified(etag)
 
-    return StreamingResponse(item_chunks())
+    response.headers["ETag"] = etag
+    return encoding.respond(ItemSchema, item, response)
 
 
-@app.patch("/update_item")
-async def update_item(
-    item_id: Annotated[int, Form()],
-    content_nonce: EncodedBytes,
-    content: UploadFile,
+# largest page of the feed that can be requested at once
+MAX_FEED_LIMIT: int = 200
+
+
+class GetFeedResult(BaseModel):
+    items: list[FeedItemSchema]
+    next: str | None
+
+
+#### read
+@app.get("/get_feed", response_model=GetFeedResult)
+async def get_feed(
+    user_id: int,
     session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+    group_id: int | None = None,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_FEED_LIMIT)] = 50,
 ):
-    item = await session.get(Item, item_id)
-    item.content = await content.read()
-    item.content_nonce = content_nonce
-    session.add(item)
-    await session.commit()
+    # get the items visible to a user, newest first, through the groups they belong to
+    # (or just the given one). every entry carries the sharing through which it is
+    # visible, so an item shared with several of the user's groups appears once per
+    # group. pages are keyed by an opaque cursor of the last (item, group) seen, and
+    # read straight off the access index
+    query = (
+        select(
+            *ITEM_METADATA,
+            Sharing.group_id,
+            Sharing.encryption_key,
+            Sharing.encryption_key_nonce,
+        )
+        .select_from(Access)
+        .join(
+            Sharing,
+            (Sharing.item_id == Access.item_id)
+            & (Sharing.group_id == Access.via_group_id),
+        )
+        .join(Item, Item.id == Access.item_id)
+        .where(Access.user_id == user_id)
+        .order_by(Access.item_id.desc(), Access.via_group_id.desc())
+        .limit(limit + 1)
+    )
+    if group_id is not None:
+        query = query.where(Access.via_group_id == group_id)
+    if after:
+        try:
+            after_item_id, after_group_id = map(int, after.split("."))
+        except ValueError:
+            raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY) from None
+        query = query.where(
+            tuple_(Access.item_id, Access.via_group_id)
+            < tuple_(after_item_id, after_group_id)
+        )
 
+    rows = (await session.execute(query)).all()
+    page = rows[:limit]
+    cursor = None
+    if len(rows) > limit:
+        cursor = f"{page[-1].id}.{page[-1].group_id}"
 
-##
-## GROUPS
-##
+    return encoding.respond(GetFeedResult, {"items": page, "next": cursor}, response)
 
 
-@app.post("/create_group")
-async def create_group(
-    host_user_id: Annotated[int, Form()],
-    name: Annotated[str, Form()],
-    grouping_encryption_key: EncodedBytes,
-    session: SessionDependency,
+#### read
+@app.get("/get_access")
+async def get_access(user_id: int, item_id: int, session: SessionDependency):
+    # get the groups through which a user can see an item. empty if they can't
+    result = await session.execute(
+        select(Access.via_group_id)
+        .where(Access.user_id == user_id, Access.item_id == item_id)
+        .order_by(Access.via_group_id)
+    )
+    return result.scalars().all()
+
+
+#### read
+@app.get("/view_item")
+async def view_item(
+    item_id: int,
+    blobs: BlobStoreDependency,
+    range_header: Annotated[str | None, Header(alias="Range")] = None,
+    if_none_match: IfNoneMatch = None,
+    if_range: IfRange = None,
 ):
-    num_existing: int = (
-        await session.execute(
-            select(func.count()).where(Group.host_user_id == host_user_id)
+    # stream item content straight out of the memory-mapped blob in large zero-copy
+    # slices, honoring byte ranges so clients can resume broken downloads and seek
+    # within large items. unchanged content is revalidated without touching the blob.
+    # popular items are served from the content cache without touching the database,
+    # and concurrent requests for an uncached item share a single load
+    cache = create_content_cache()
+    if if_none_match and item_id not in cache:
+        # a miss is revalidated against the digest alone, before any content loads
+        item = await load_item(item_id)
+        etag = blob_etag(item.digest)
+        if matches(if_none_match, etag):
+            return not_modified(etag)
+
+    digest, content = await cache.get(item_id, lambda: load_content(item_id, blobs))
+
+    etag = blob_etag(digest)
+    if matches(if_none_match, etag):
+        return not_modified(etag)
+
+    return content_response(content, range_header, etag=etag, if_range=if_range)
+
+
+async def load_item(item_id: int) -> Row[tuple[str, int, int | None]]:
+    # get the digest and size of an item's whole content. uses its own session, since
+    # a load is shared by every request waiting on it
+    async with create_session() as session:
+        result = await session.execute(
+            select(Item.digest, Item.size, Item.segment_size).where(Item.id == item_id)
         )
-    ).scalar_one()
+        item = result.one_or_none()
 
-    # create group
-    g = Group(name=name, host_user_id=host_user_id, private=(num_existing == 0))
-    session.add(g)
-    await session.commit()
+    if not item:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    if item.segment_size:
+        # segmented content is only available segment by segment
+        raise HTTPException(status.HTTP_409_CONFLICT)
+    return item
 
-    # create new grouping for private group
-    session.add(
-        Grouping(
-            user_id=host_user_id,
-            group_id=await g.awaitable_attrs.id,
-            encryption_key=grouping_encryption_key,
+
+async def load_content(item_id: int, blobs: BlobStore) -> CachedContent:
+    item = await load_item(item_id)
+
+    # content small enough to be cached is read into memory. a mapping would pin a
+    # file descriptor for as long as it stays cached
+    cache = create_content_cache()
+    read = blobs.read if item.size <= cache.max_entry_size else blobs.open
+    content = await run_in_threadpool(read, item.digest)
+    return CachedContent(item.digest, content)
+
+
+#### read
+@app.get("/get_cache_stats")
+async def get_cache_stats():
+    # DEBUG ONLY
+    return {
+        "content": create_content_cache().stats(),
+        "lookups": create_lookup_cache().stats(),
+        "directory": create_directory_cache().stats(),
+    }
+
+
+@app.patch("/update_item")
+async def update_item(
+    item_id: Annotated[int, Form()],
+    content_nonce: EncodedBytes,
+    content: UploadFile,
+    session: SessionDependency,
+    blobs: BlobStoreDependency,
+    variant_uploads: VariantUploadsDependency,
+):
+    # check the item up front, then let go of the connection while the content
+    # streams in
+    await check_whole_item(item_id, session)
+    await session.rollback()
+
+    digests: list[str] = []
+    try:
+        digest, size = await ingest(iter_upload(content), blobs)
+        digests.append(digest)
+        variants = await ingest_variants(variant_uploads.uploads, blobs, digests)
+
+        # serialize concurrent writes to the same item, which may have changed since
+        item = await check_whole_item(item_id, session, lock=True)
+        previous_digests = [item.digest]
+        item.digest, item.size, item.content_nonce = digest, size, content_nonce
+        session.add(item)
+
+        # existing variants may have been encrypted with a key that is being rotated
+        # out, so they are always replaced by whichever ones accompany the new content
+        result = await session.execute(
+            delete(Variant).where(Variant.item_id == item_id).returning(Variant.digest)
+        )
+        previous_digests += result.scalars().all()
+        await store_variants(item_id, variants, session)
+        await changes.record(session, "item", "update", item_id=item_id)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        for digest in digests:
+            await release_blob(digest, session, blobs)
+        raise
+    create_content_cache().invalidate(item_id)
+
+    for digest in previous_digests:
+        await release_blob(digest, session, blobs)
+
+
+async def check_whole_item(
+    item_id: int, session: AsyncSession, lock: bool = False
+) -> Item:
+    # get an item whose content is stored whole, rather than in segments
+    item = await session.get(Item, item_id, with_for_update=lock)
+    if not item:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    if item.segment_size:
+        raise HTTPException(status.HTTP_409_CONFLICT)
+    return item
+
+
+async def release_blob(digest: str, session: AsyncSession, blobs: BlobStore):
+    # delete a blob from the store once nothing references it anymore
+    result = await session.execute(
+        select(
+            exists().where(Item.digest == digest)
+            | exists().where(Segment.digest == digest)
+            | exists().where(Variant.digest == digest)
         )
     )
-    await session.commit()
+    if not result.scalar():
+        await run_in_threadpool(blobs.delete, digest)
 
-    await session.refresh(g)
-    return g
 
+### SEGMENTS
 
-### GROUPINGS
+# bytes added to every segment by encryption (the secretbox MAC)
+SEGMENT_OVERHEAD: int = 16
+
+# segment indexes are stored as 32-bit integers
+MAX_SEGMENT_INDEX: int = 2**31 - 1
 
 
 #### create
-@app.post("/invite_to_group")
-async def invite_to_group(
-    invitee_id: Annotated[int, Form()],
-    group_id: Annotated[int, Form()],
-    grouping_encryption_key: EncodedBytes,
+@app.post("/create_segmented_item")
+async def create_segmented_item(
+    owner_user_id: Annotated[int, Form()],
+    segment_size: Annotated[int, Form(gt=0, le=MAX_BLOB_SIZE - SEGMENT_OVERHEAD)],
+    encryption_key: EncodedBytes,
+    encryption_key_nonce: EncodedBytes,
     session: SessionDependency,
 ):
-    # create new grouping. "status" (invite -> accept) not needed for POC
-    grouping = Grouping(
-        user_id=invitee_id, group_id=group_id, encryption_key=grouping_encryption_key
+    # create an item whose content is uploaded as individually encrypted segments of
+    # a fixed plaintext size, each with its own nonce
+    i = Item(content_nonce=None, size=0, digest=None, segment_size=segment_size)
+    item_id, private_group_id = await add_item(
+        session, owner_user_id, i, encryption_key, encryption_key_nonce
     )
-    session.add(grouping)
     await session.commit()
-    await session.refresh(grouping)
-    return grouping
+    forget_sharing(item_id, private_group_id)
+
+    return item_id
 
 
 #### read
-@app.get("/get_memberships")
-async def get_memberships(user_id: int, session: SessionDependency):
-    # get groupings for a single user
+@app.get("/get_segments", response_model=list[SegmentSchema])
+async def get_segments(
+    item_id: int,
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+):
+    # get the metadata of every segment of an item, in order
     result = await session.execute(
-        select(Grouping).where(Grouping.user_id == user_id).order_by(Grouping.group_id)
+        select(Segment.index, Segment.nonce, Segment.size, Segment.digest)
+        .where(Segment.item_id == item_id)
+        .order_by(Segment.index)
     )
-    groupings = result.scalars().all()
+    return encoding.respond(list[SegmentSchema], result.all(), response)
 
-    # get groups for the groupings
+
+#### read
+@app.get("/view_segment")
+async def view_segment(
+    item_id: int,
+    index: int,
+    session: SessionDependency,
+    blobs: BlobStoreDependency,
+    range_header: Annotated[str | None, Header(alias="Range")] = None,
+    if_none_match: IfNoneMatch = None,
+    if_range: IfRange = None,
+):
+    # stream a single segment, so clients can decrypt and render progressively
     result = await session.execute(
-        select(Group)
-        .where(Group.id.in_([grouping.group_id for grouping in groupings]))
-        .order_by(Group.id)
+        select(Segment.digest).where(Segment.item_id == item_id, Segment.index == index)
     )
-    groups = result.scalars().all()
+    digest = result.scalar_one_or_none()
+    if not digest:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
 
-    return [
-        {"group": group, "grouping": grouping}
-        for group, grouping in zip(groups, groupings, strict=True)
-    ]
+    etag = blob_etag(digest)
+    if matches(if_none_match, etag):
+        return not_modified(etag)
 
+    content = await run_in_threadpool(blobs.open, digest)
+    return content_response(content, range_header, etag=etag, if_range=if_range)
 
-class GetGroupingsParams(BaseModel):
-    user_id: int
-    group_ids: list[int]
 
+#### update
+@app.put("/put_segment")
+async def put_segment(
+    item_id: Annotated[int, Form()],
+    index: Annotated[int, Form(ge=0, le=MAX_SEGMENT_INDEX)],
+    nonce: EncodedBytes,
+    content: UploadFile,
+    session: SessionDependency,
+    blobs: BlobStoreDependency,
+):
+    # create or replace a single segment, leaving the rest of the item untouched
+    item = await session.get(Item, item_id)
+    if not item:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    if not item.segment_size:
+        raise HTTPException(status.HTTP_409_CONFLICT)
 
-#### read
-@app.post("/get_groupings")
-async def get_groupings(params: GetGroupingsParams, session: SessionDependency):
-    # get all groupings for a single user against the known groups
-    groupings = await session.execute(
-        select(Grouping).where(
-            Grouping.user_id == params.user_id, Grouping.group_id.in_(params.group_ids)
+    max_size = item.segment_size + SEGMENT_OVERHEAD
+    await session.rollback()
+
+    digests: list[str] = []
+    try:
+        digest, size = await ingest(iter_upload(content), blobs, max_size)
+        digests.append(digest)
+
+        # serialize concurrent writes to the same item, which may be gone by now
+        if not await session.get(Item, item_id, with_for_update=True):
+            raise HTTPException(status.HTTP_404_NOT_FOUND)
+        result = await session.execute(
+            select(Segment).where(Segment.item_id == item_id, Segment.index == index)
         )
-    )
-    ## ideally we'd ensure len(groupings) == len(group_ids) for security
-    return {grouping.group_id: grouping for grouping in groupings.scalars().all()}
+        segment = result.scalar_one_or_none()
+        previous_digest = segment.digest if segment else None
+        if segment:
+            segment.nonce, segment.size, segment.digest = nonce, size, digest
+        else:
+            segment = Segment(
+                item_id=item_id, index=index, nonce=nonce, size=size, digest=digest
+            )
+        session.add(segment)
+        await session.flush()
+
+        await update_segmented_size(item_id, session)
+        await changes.record(session, "item", "update", item_id=item_id)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        for digest in digests:
+            await release_blob(digest, session, blobs)
+        raise
 
+    if previous_digest:
+        await release_blob(previous_digest, session, blobs)
 
-# class RemoveFromGroupParams(BaseModel):
-#     user_id: int
-#     group_id: int
 
+#### delete
+@app.post("/truncate_segments")
+async def truncate_segments(
+    item_id: Annotated[int, Form()],
+    count: Annotated[int, Form(ge=0, le=MAX_SEGMENT_INDEX)],
+    session: SessionDependency,
+    blobs: BlobStoreDependency,
+):
+    # drop every segment past the first `count`, for edits that shrink an item
+    item = await session.get(Item, item_id, with_for_update=True)
+    if not item:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    if not item.segment_size:
+        raise HTTPException(status.HTTP_409_CONFLICT)
 
-# @app.post("/remove_from_group")
-# async def remove_from_group(params: RemoveFromGroupParams, session: SessionDependency):
-#     # delete a grouping
-#     await session.execute(
-#         delete(Grouping).where(
-#             Grouping.user_id == params.user_id, Grouping.group_id == params.group_id
-#         )
-#     )
+    result = await session.execute(
+        delete(Segment)
+        .where(Segment.item_id == item_id, Segment.index >= count)
+        .returning(Segment.digest)
+    )
+    digests = result.scalars().all()
+    await update_segmented_size(item_id, session)
+    await changes.record(session, "item", "update", item_id=item_id)
+    await session.commit()
 
-### SHARINGS
+    for digest in digests:
+        await release_blob(digest, session, blobs)
 
 
-#### create
-@app.post("/share_with_group")
-async def share_with_group(
-    item_id: Annotated[int, Form()],
-    group_id: Annotated[int, Form()],
-    encryption_key: EncodedBytes,
-    encryption_key_nonce: EncodedBytes,
-    session: SessionDependency,
-):
-    session.add(
-        Sharing(
-            item_id=item_id,
-            group_id=group_id,
-            encryption_key=encryption_key,
-            encryption_key_nonce=encryption_key_nonce,
+async def update_segmented_size(item_id: int, session: AsyncSession):
+    # a segmented item's size is the total size of its segments
+    await session.execute(
+        update(Item)
+        .where(Item.id == item_id)
+        .values(
+            size=select(func.coalesce(func.sum(Segment.size), 0))
+            .where(Segment.item_id == item_id)
+            .scalar_subquery()
         )
     )
-    await session.commit()
+
+
+### VARIANTS
+
+# largest encrypted variant accepted. variants exist to be much smaller than items
+MAX_VARIANT_SIZE: int = 8 * 1024 * 1024
 
 
 #### read
-@app.get("/get_sharings")
-async def get_sharings(item_id: int, session: SessionDependency):
-    # get all sharings for a single item.
-    sharing = await session.execute(select(Sharing).where(Sharing.item_id == item_id))
-    return sharing.scalars().all()
+@app.get("/get_variants", response_model=list[VariantSchema])
+async def get_variants(
+    item_id: int,
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+):
+    # get the metadata of every variant of an item
+    result = await session.execute(
+        select(Variant.name, Variant.nonce, Variant.size, Variant.digest)
+        .where(Variant.item_id == item_id)
+        .order_by(Variant.name)
+    )
+    return encoding.respond(list[VariantSchema], result.all(), response)
 
 
 #### read
-@app.get("/get_sharing")
-async def get_sharing(item_id: int, group_id: int, session: SessionDependency):
-    # get sharing for a single user and a single items
-    sharing = await session.execute(
-        select(Sharing)
-        .where(Sharing.group_id == group_id, Sharing.item_id == item_id)
-        .limit(1)
+@app.get("/view_variant")
+async def view_variant(
+    item_id: int,
+    name: VariantName,
+    session: SessionDependency,
+    blobs: BlobStoreDependency,
+    range_header: Annotated[str | None, Header(alias="Range")] = None,
+    if_none_match: IfNoneMatch = None,
+    if_range: IfRange = None,
+):
+    # stream a single variant of an item
+    result = await session.execute(
+        select(Variant.digest).where(Variant.item_id == item_id, Variant.name == name)
     )
-    try:
-        return sharing.scalar_one()
-    except Exception:
-        raise HTTPException(status.HTTP_403_FORBIDDEN) from None
+    digest = result.scalar_one_or_none()
+    if not digest:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+
+    etag = blob_etag(digest)
+    if matches(if_none_match, etag):
+        return not_modified(etag)
+
+    content = await run_in_threadpool(blobs.open, digest)
+    return content_response(content, range_header, etag=etag, if_range=if_range)
 
 
 #### update
-@app.patch("/update_sharing")
-async def update_sharing(
+@app.put("/put_variant")
+async def put_variant(
     item_id: Annotated[int, Form()],
-    group_id: Annotated[int, Form()],
-    encryption_key: EncodedBytes,
-    encryption_key_nonce: EncodedBytes,
+    name: Annotated[VariantName, Form()],
+    nonce: EncodedBytes,
+    content: UploadFile,
     session: SessionDependency,
+    blobs: BlobStoreDependency,
 ):
-    # get all sharings for a single item.
-    sharing = await session.execute(
-        select(Sharing).where(Sharing.item_id == item_id, Sharing.group_id == group_id)
-    )
-    sharing = sharing.scalar_one()
-    sharing.encryption_key = encryption_key
-    sharing.encryption_key_nonce = encryption_key_nonce
-    session.add(sharing)
-    await session.commit()
+    # create or replace a single variant of an item. the item is checked up front,
+    # and the connection let go of while the content streams in
+    if not await session.get(Item, item_id):
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    await session.rollback()
+
+    digests: list[str] = []
+    try:
+        variants = await ingest_variants({name: (content, nonce)}, blobs, digests)
+
+        # serialize concurrent writes to the same item, which may be gone by now
+        if not await session.get(Item, item_id, with_for_update=True):
+            raise HTTPException(status.HTTP_404_NOT_FOUND)
+        previous_digests = await store_variants(item_id, variants, session)
+        await changes.record(session, "item", "update", item_id=item_id)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        for digest in digests:
+            await release_blob(digest, session, blobs)
+        raise
+
+    for digest in previous_digests:
+        await release_blob(digest, session, blobs)
+
+
+async def ingest_variants(
+    variants: dict[VariantName, tuple[UploadFile | None, bytes | None]],
+    blobs: BlobStore,
+    digests: list[str],
+) -> dict[VariantName, tuple[bytes, str, int]]:
+    # stream the given variants into the store, returning the nonce, digest, and size
+    # of each. the digest of every blob ingested is added to `digests` as soon as it
+    # is, so that the caller can release them should anything fail later on
+    uploaded = {
+        name: (content, nonce) for name, (content, nonce) in variants.items() if content
+    }
+    if not all(nonce for _, nonce in uploaded.values()):
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    ingested: dict[VariantName, tuple[bytes, str, int]] = {}
+    for name, (content, nonce) in uploaded.items():
+        digest, size = await ingest(iter_upload(content), blobs, MAX_VARIANT_SIZE)
+        digests.append(digest)
+        ingested[name] = (nonce, digest, size)
+
+    return ingested
+
+
+async def store_variants(
+    item_id: int,
+    variants: dict[VariantName, tuple[bytes, str, int]],
+    session: AsyncSession,
+) -> list[str]:
+    # point the item at the given ingested variants, returning the digests of any
+    # variants they replace. the caller commits
+    previous_digests: list[str] = []
+    for name, (nonce, digest, size) in variants.items():
+        result = await session.execute(
+            delete(Variant)
+            .where(Variant.item_id == item_id, Variant.name == name)
+            .returning(Variant.digest)
+        )
+        previous_digests += result.scalars().all()
+        session.add(
+            Variant(item_id=item_id, name=name, nonce=nonce, size=size, digest=digest)
+        )
 
+    return previous_digests
 
-class UnshareFromGroupParams(BaseModel):
-    item_id: int
-    group_id: int
 
+### BUNDLES
 
-#### delete
-@app.delete("/unshare_from_group")
-async def unshare_from_group(
-    params: UnshareFromGroupParams, session: SessionDependency
+BUNDLE_MEDIA_TYPE = "application/x-poc-bundle"
+
+# most items that can be requested in a single bundle
+MAX_BUNDLE_ITEMS: int = 500
+
+
+class GetBundleParams(BaseModel):
+    item_ids: list[int]
+    group_id: int | None = None
+    variant: VariantName | None = None
+
+
+#### read
+@app.post("/get_bundle")
+async def get_bundle(
+    params: GetBundleParams, session: SessionDependency, blobs: BlobStoreDependency
+):
+    # stream many items back-to-back in a single response. every item is framed as a
+    # 4-byte big-endian header length, a JSON header, and then `size` bytes of
+    # ciphertext. if a group is given, the header carries the item's sharing with
+    # that group, and content is only sent for items shared with it. if a variant is
+    # given, it is sent in place of the content of items that have one
+    item_ids = list(dict.fromkeys(params.item_ids))
+    if len(item_ids) > MAX_BUNDLE_ITEMS:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    # everything needed for the whole bundle comes from a single query
+    query = select(
+        Item.id,
+        Item.content_nonce,
+        Item.size,
+        Item.digest,
+        Sharing.encryption_key,
+        Sharing.encryption_key_nonce,
+        Variant.nonce.label("variant_nonce"),
+        Variant.size.label("variant_size"),
+        Variant.digest.label("variant_digest"),
+    ).where(Item.id.in_(item_ids))
+    query = query.outerjoin(
+        Sharing, (Sharing.item_id == Item.id) & (Sharing.group_id == params.group_id)
+    ).outerjoin(
+        Variant, (Variant.item_id == Item.id) & (Variant.name == params.variant)
+    )
+    rows = {row.id: row for row in await session.execute(query)}
+
+    frames: list[tuple[bytes, str | None]] = []
+    length = 0
+    for item_id in item_ids:
+        header, digest = bundle_header(item_id, rows.get(item_id), params)
+        encoded = dumps(header)
+        frames.append((struct.pack(">I", len(encoded)) + encoded, digest))
+        length += 4 + len(encoded) + header["size"]
+
+    return StreamingResponse(
+        bundle_frames(frames, blobs),
+        media_type=BUNDLE_MEDIA_TYPE,
+        headers={"Content-Length": str(length)},
+    )
+
+
+def bundle_header(
+    item_id: int, row: Row | None, params: GetBundleParams
+) -> tuple[dict, str | None]:
+    # build the header of a bundled item, and find the blob that follows it (if any)
+    if not row:
+        return {"id": item_id, "missing": True, "size": 0}, None
+
+    sharing = None
+    if row.encryption_key:
+        sharing = {
+            "encryption_key": row.encryption_key,
+            "encryption_key_nonce": row.encryption_key_nonce,
+        }
+
+    header = {"id": item_id, "sharing": sharing, "variant": None, "size": 0}
+    if (params.group_id is not None and not sharing) or not (
+        row.variant_digest or row.digest
+    ):
+        # nothing the client could decrypt, or segmented content
+        return header, None
+
+    if row.variant_digest:
+        header.update(
+            variant=params.variant,
+            content_nonce=row.variant_nonce,
+            size=row.variant_size,
+        )
+        return header, row.variant_digest
+
+    header.update(content_nonce=row.content_nonce, size=row.size)
+    return header, row.digest
+
+
+async def bundle_frames(
+    frames: list[tuple[bytes, str | None]], blobs: BlobStore
+) -> AsyncIterator[bytes | memoryview]:
+    for header, digest in frames:
+        yield header
+        if digest:
+            content = await run_in_threadpool(blobs.open, digest)
+            async for chunk in slices(content, 0, len(content) - 1, CHUNK_SIZE):
+                yield chunk
+
+
+### UPLOADS
+
+# how long an upload may sit idle before it is considered abandoned
+UPLOAD_TTL = timedelta(hours=24)
+
+# how often abandoned uploads are looked for, in seconds
+UPLOAD_SWEEP_INTERVAL: float = 15 * 60
+
+
+#### create
+@app.post("/create_upload")
+async def create_upload(
+    owner_user_id: Annotated[int, Form()],
+    size: Annotated[int, Form()],
+    encryption_key: EncodedBytes,
+    encryption_key_nonce: EncodedBytes,
+    content_nonce: EncodedBytes,
+    session: SessionDependency,
+    blobs: BlobStoreDependency,
+):
+    # start a resumable upload. the encrypted content is then sent in chunks, in any
+    # order and in parallel, before being turned into an item
+    if not 0 <= size <= MAX_BLOB_SIZE:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    upload = Upload(
+        id=token_urlsafe(24),
+        owner_user_id=owner_user_id,
+        size=size,
+        content_nonce=content_nonce,
+        encryption_key=encryption_key,
+        encryption_key_nonce=encryption_key_nonce,
+        expires_at=datetime.now(UTC) + UPLOAD_TTL,
+    )
+    await run_in_threadpool(blobs.create_partial, upload.id, size)
+    session.add(upload)
+    created = {"id": upload.id, "size": size, "expires_at": upload.expires_at}
+    await session.commit()
+
+    return created
+
+
+#### update
+@app.put("/upload_chunk")
+async def upload_chunk(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    session: SessionDependency,
+    blobs: BlobStoreDependency,
+):
+    # write the raw request body into the upload at the given offset
+    upload = await session.get(Upload, upload_id)
+    if not upload or upload.expires_at < datetime.now(UTC):
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    if not 0 <= offset <= upload.size:
+        raise HTTPException(status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    # don't hold on to a connection while the chunk streams in
+    upload_size = upload.size
+    await session.rollback()
+
+    written = await ingest_partial(
+        request.stream(), blobs, upload_id, offset, upload_size
+    )
+
+    # record the received range and push back the expiry
+    result = await session.execute(
+        update(Upload)
+        .where(Upload.id == upload_id)
+        .values(expires_at=datetime.now(UTC) + UPLOAD_TTL)
+        .returning(Upload.id)
+    )
+    if not result.scalar_one_or_none():
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    if written:
+        session.add(UploadChunk(upload_id=upload_id, offset=offset, size=written))
+    await session.commit()
+
+
+#### read
+@app.get("/get_upload")
+async def get_upload(upload_id: str, session: SessionDependency):
+    # get the ranges of an upload that have been received so far
+    upload = await session.get(Upload, upload_id)
+    if not upload:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+
+    result = await session.execute(
+        select(UploadChunk.offset, UploadChunk.size).where(
+            UploadChunk.upload_id == upload_id
+        )
+    )
+    received = coalesce([(offset, offset + size - 1) for offset, size in result])
+    return {
+        "id": upload.id,
+        "size": upload.size,
+        "expires_at": upload.expires_at,
+        "received": [
+            {"offset": start, "size": end - start + 1} for start, end in received
+        ],
+    }
+
+
+#### create
+@app.post("/finish_upload")
+async def finish_upload(
+    upload_id: Annotated[str, Form()],
+    session: SessionDependency,
+    blobs: BlobStoreDependency,
+):
+    # turn a completely received upload into an item. the upload is checked up front,
+    # and the connection let go of while its content is hashed into the store
+    await check_finishable(upload_id, session)
+    await session.rollback()
+
+    # the partial content is only discarded once the item exists, so that a failure
+    # in between leaves the upload intact to be finished again
+    try:
+        digest, size = await run_in_threadpool(blobs.commit_partial, upload_id)
+    except FileNotFoundError:
+        # finished by a concurrent request in the meantime
+        raise HTTPException(status.HTTP_404_NOT_FOUND) from None
+    try:
+        # serialize concurrent finishes of the same upload, which may be gone by now
+        upload = await check_finishable(upload_id, session, lock=True)
+        i = Item(content_nonce=upload.content_nonce, size=size, digest=digest)
+        owner_user_id = upload.owner_user_id
+        encryption_key = upload.encryption_key
+        encryption_key_nonce = upload.encryption_key_nonce
+        await session.delete(upload)
+        item_id, private_group_id = await add_item(
+            session, owner_user_id, i, encryption_key, encryption_key_nonce
+        )
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        await release_blob(digest, session, blobs)
+        raise
+    forget_sharing(item_id, private_group_id)
+
+    await run_in_threadpool(blobs.delete_partial, upload_id)
+    return item_id
+
+
+async def check_finishable(
+    upload_id: str, session: AsyncSession, lock: bool = False
+) -> Upload:
+    # get an upload whose content has been received in full
+    upload = await session.get(Upload, upload_id, with_for_update=lock)
+    if not upload:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+
+    result = await session.execute(
+        select(UploadChunk.offset, UploadChunk.size).where(
+            UploadChunk.upload_id == upload_id
+        )
+    )
+    received = coalesce([(offset, offset + size - 1) for offset, size in result])
+    if upload.size and received != [(0, upload.size - 1)]:
+        raise HTTPException(status.HTTP_409_CONFLICT)
+
+    # the item is shared with the owner's private group, so there has to be one
+    result = await session.execute(
+        select(User.private_group_id).where(User.id == upload.owner_user_id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status.HTTP_409_CONFLICT)
+    return upload
+
+
+async def expire_uploads():
+    # discard uploads that have sat idle for too long
+    blobs = create_blob_store(BLOB_ROOT)
+    async with create_session() as session:
+        result = await session.execute(
+            delete(Upload).where(Upload.expires_at < func.now()).returning(Upload.id)
+        )
+        expired = result.scalars().all()
+        await session.commit()
+
+    for upload_id in expired:
+        await run_in_threadpool(blobs.delete_partial, upload_id)
+
+
+##
+## GROUPS
+##
+
+
+@app.post("/create_group", response_model=GroupSchema)
+async def create_group(
+    host_user_id: Annotated[int, Form()],
+    name: Annotated[str, Form()],
+    grouping_encryption_key: EncodedBytes,
+    session: SessionDependency,
+):
+    # create group. the first group a user hosts is their private group
+    result = await session.execute(
+        insert(Group)
+        .values(
+            name=name,
+            host_user_id=host_user_id,
+            private=select(User.private_group_id.is_(None))
+            .where(User.id == host_user_id)
+            .scalar_subquery(),
+        )
+        .returning(Group.id, Group.name, Group.host_user_id, Group.private)
+    )
+    g = result.one()._asdict()
+    group_id = g["id"]
+    if g["private"]:
+        await session.execute(
+            update(User)
+            .where(User.id == host_user_id)
+            .values(private_group_id=group_id)
+        )
+
+    # create new grouping for the host
+    session.add(
+        Grouping(
+            user_id=host_user_id,
+            group_id=group_id,
+            encryption_key=grouping_encryption_key,
+        )
+    )
+    await access.grant_membership(session, host_user_id, group_id)
+    await changes.record(
+        session, "grouping", "create", user_id=host_user_id, group_id=group_id
+    )
+    await session.commit()
+    forget_grouping(host_user_id, group_id)
+
+    return g
+
+
+### GROUPINGS
+
+GROUPING_COLUMNS = (
+    Grouping.id,
+    Grouping.user_id,
+    Grouping.group_id,
+    Grouping.encryption_key,
+)
+
+
+#### create
+@app.post("/invite_to_group", response_model=GroupingSchema)
+async def invite_to_group(
+    invitee_id: Annotated[int, Form()],
+    group_id: Annotated[int, Form()],
+    grouping_encryption_key: EncodedBytes,
+    session: SessionDependency,
+):
+    # create new grouping. "status" (invite -> accept) not needed for POC
+    result = await session.execute(
+        insert(Grouping)
+        .values(
+            user_id=invitee_id,
+            group_id=group_id,
+            encryption_key=grouping_encryption_key,
+        )
+        .returning(*GROUPING_COLUMNS)
+    )
+    grouping = result.one()._asdict()
+    await access.grant_membership(session, invitee_id, group_id)
+    await changes.record(
+        session, "grouping", "create", user_id=invitee_id, group_id=group_id
+    )
+    await session.commit()
+    forget_grouping(invitee_id, group_id)
+
+    return grouping
+
+
+# most users that can be invited to a group at once
+MAX_BULK_INVITES: int = 10_000
+
+
+class BulkInvitee(BaseModel):
+    invitee_id: int
+    grouping_encryption_key: Binary
+
+
+class InviteManyToGroupParams(BaseModel):
+    group_id: int
+    invitees: list[BulkInvitee]
+
+
+#### create
+@app.post("/invite_many_to_group")
+async def invite_many_to_group(
+    params: InviteManyToGroupParams, session: SessionDependency
+):
+    # invite many users to a group with a single insert, skipping anyone who is
+    # already a member. every requested invitee gets a result, in order: "invited",
+    # "member" if they already were one, "duplicate" if they were listed before, or
+    # "missing" if there's no such user
+    if len(params.invitees) > MAX_BULK_INVITES:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    # serialize bulk invitations to the same group, so they can't both add someone
+    group_id = params.group_id
+    result = await session.execute(
+        select(Group.id).where(Group.id == group_id).with_for_update()
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+
+    keys: dict[int, bytes] = {}
+    for invitee in params.invitees:
+        keys.setdefault(invitee.invitee_id, invitee.grouping_encryption_key)
+
+    invited: set[int] = set()
+    known: set[int] = set()
+    if keys:
+        invitees = values(
+            column("user_id", Integer),
+            column("encryption_key", LargeBinary),
+            name="invitees",
+        ).data(list(keys.items()))
+        result = await session.execute(
+            insert(Grouping)
+            .from_select(
+                ["user_id", "group_id", "encryption_key"],
+                select(invitees.c.user_id, literal(group_id), invitees.c.encryption_key)
+                .join(User, User.id == invitees.c.user_id)
+                .where(
+                    ~exists().where(
+                        Grouping.user_id == invitees.c.user_id,
+                        Grouping.group_id == group_id,
+                    )
+                ),
+            )
+            .returning(Grouping.user_id)
+        )
+        invited = set(result.scalars().all())
+        result = await session.execute(select(User.id).where(User.id.in_(keys)))
+        known = set(result.scalars().all())
+
+    if invited:
+        await access.grant_memberships(session, invited, group_id)
+        await changes.record_all(
+            session,
+            [
+                Change(kind="grouping", op="create", user_id=user_id, group_id=group_id)
+                for user_id in invited
+            ],
+        )
+    await session.commit()
+    for user_id in invited:
+        forget_grouping(user_id, group_id)
+
+    results = []
+    seen: set[int] = set()
+    for invitee in params.invitees:
+        user_id = invitee.invitee_id
+        if user_id in seen:
+            outcome = "duplicate"
+        elif user_id in invited:
+            outcome = "invited"
+        elif user_id in known:
+            outcome = "member"
+        else:
+            outcome = "missing"
+        seen.add(user_id)
+        results.append({"invitee_id": user_id, "result": outcome})
+
+    return results
+
+
+#### read
+@app.get("/get_memberships", response_model=list[MembershipSchema])
+async def get_memberships(
+    user_id: int,
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+    if_none_match: IfNoneMatch = None,
+):
+    lookups = create_lookup_cache()
+    key = ("memberships", user_id)
+    cached = lookups.get(key)
+    if cached is MISSING:
+        generation = lookups.generation
+        scope = f"memberships:{user_id}"
+        etag = make_etag(scope, await changes.version(session, scope))
+
+        # get groupings for a single user
+        result = await session.execute(
+            select(Grouping)
+            .where(Grouping.user_id == user_id)
+            .order_by(Grouping.group_id)
+        )
+        groupings = result.scalars().all()
+
+        # get groups for the groupings
+        result = await session.execute(
+            select(Group)
+            .where(Group.id.in_([grouping.group_id for grouping in groupings]))
+            .order_by(Group.id)
+        )
+        groups = result.scalars().all()
+
+        memberships = [
+            MembershipSchema(
+                group=GroupSchema.model_validate(group),
+                grouping=GroupingSchema.model_validate(grouping),
+            )
+            for group, grouping in zip(groups, groupings, strict=True)
+        ]
+        cached = (etag, memberships)
+        lookups.put(key, cached, generation)
+
+    etag, memberships = cached
+    etag = encoding.etag(etag)
+    if matches(if_none_match, etag):
+        return not_modified(etag)
+
+    response.headers["ETag"] = etag
+    return encoding.respond(list[MembershipSchema], memberships, response)
+
+
+class GetGroupingsParams(BaseModel):
+    user_id: int
+    group_ids: list[int]
+
+
+#### read
+@app.post("/get_groupings", response_model=dict[int, GroupingSchema])
+async def get_groupings(
+    params: GetGroupingsParams,
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+):
+    # get all groupings for a single user against the known groups, only looking up
+    # the ones that aren't cached. groups the user isn't in are cached as such
+    lookups = create_lookup_cache()
+    groupings: dict[int, GroupingSchema | None] = {}
+    for group_id in params.group_ids:
+        groupings[group_id] = lookups.get(("grouping", params.user_id, group_id))
+
+    unknown = [group_id for group_id, found in groupings.items() if found is MISSING]
+    if unknown:
+        generation = lookups.generation
+        result = await session.execute(
+            select(Grouping).where(
+                Grouping.user_id == params.user_id, Grouping.group_id.in_(unknown)
+            )
+        )
+        found = {
+            grouping.group_id: GroupingSchema.model_validate(grouping)
+            for grouping in result.scalars().all()
+        }
+        for group_id in unknown:
+            groupings[group_id] = found.get(group_id)
+            lookups.put(
+                ("grouping", params.user_id, group_id), groupings[group_id], generation
+            )
+
+    ## ideally we'd ensure len(groupings) == len(group_ids) for security
+    found = {
+        group_id: grouping
+        for group_id, grouping in groupings.items()
+        if grouping is not None
+    }
+    return encoding.respond(dict[int, GroupingSchema], found, response)
+
+
+class RemoveFromGroupParams(BaseModel):
+    user_id: int
+    group_id: int
+
+
+#### delete
+@app.post("/remove_from_group")
+async def remove_from_group(params: RemoveFromGroupParams, session: SessionDependency):
+    # delete a grouping. the removed user may still hold the group's key, so the key
+    # should be rotated afterwards (see ROTATIONS)
+    result = await session.execute(
+        delete(Grouping)
+        .where(Grouping.user_id == params.user_id, Grouping.group_id == params.group_id)
+        .returning(Grouping.id)
+    )
+    if not result.scalars().all():
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+
+    await access.revoke_membership(session, params.user_id, params.group_id)
+    await changes.record(
+        session,
+        "grouping",
+        "delete",
+        user_id=params.user_id,
+        group_id=params.group_id,
+    )
+    await session.commit()
+    forget_grouping(params.user_id, params.group_id)
+
+
+### ROTATIONS
+#
+# rotating a group's key means rewrapping it for every remaining member, and
+# rewrapping the key of every item shared with the group. since that can be a lot of
+# rows, the client pages through what still needs rewrapping and stages new keys in
+# batches, which can be resumed at any point. once everything is staged, the new keys
+# are swapped in at once
+
+# most rows that can be paged through or staged at once
+MAX_ROTATION_BATCH: int = 5_000
+
+ROTATION_COLUMNS = (
+    Rotation.id,
+    Rotation.group_id,
+    Rotation.created_at,
+    Rotation.finished_at,
+)
+
+
+#### create
+@app.post("/start_rotation")
+async def start_rotation(group_id: Annotated[int, Form()], session: SessionDependency):
+    # start rotating a group's key. only one rotation per group may be in progress
+    await session.execute(
+        select(Group.id).where(Group.id == group_id).with_for_update()
+    )
+    result = await session.execute(
+        select(Rotation.id).where(
+            Rotation.group_id == group_id, Rotation.finished_at.is_(None)
+        )
+    )
+    if result.scalars().first() is not None:
+        raise HTTPException(status.HTTP_409_CONFLICT)
+
+    result = await session.execute(
+        insert(Rotation).values(group_id=group_id).returning(*ROTATION_COLUMNS)
+    )
+    rotation = result.one()._asdict()
+    await session.commit()
+
+    return rotation
+
+
+#### read
+@app.get("/get_rotation")
+async def get_rotation(rotation_id: int, session: SessionDependency):
+    # get the progress of a rotation, ie. how many sharings and members have had new
+    # keys staged out of how many there are
+    result = await session.execute(
+        select(*ROTATION_COLUMNS).where(Rotation.id == rotation_id)
+    )
+    rotation = result.one_or_none()
+    if not rotation:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+
+    group_id = rotation.group_id
+    result = await session.execute(
+        select(
+            select(func.count())
+            .where(Sharing.group_id == group_id)
+            .scalar_subquery()
+            .label("sharings"),
+            select(func.count())
+            .select_from(StagedSharing)
+            .join(
+                Sharing,
+                (Sharing.group_id == group_id)
+                & (Sharing.item_id == StagedSharing.item_id),
+            )
+            .where(StagedSharing.rotation_id == rotation_id)
+            .scalar_subquery()
+            .label("staged_sharings"),
+            select(func.count())
+            .where(Grouping.group_id == group_id)
+            .scalar_subquery()
+            .label("groupings"),
+            select(func.count())
+            .select_from(StagedGrouping)
+            .join(
+                Grouping,
+                (Grouping.group_id == group_id)
+                & (Grouping.user_id == StagedGrouping.user_id),
+            )
+            .where(StagedGrouping.rotation_id == rotation_id)
+            .scalar_subquery()
+            .label("staged_groupings"),
+        )
+    )
+    return {**rotation._asdict(), **result.one()._asdict()}
+
+
+class RotationSharing(BaseModel):
+    item_id: int
+    encryption_key: Binary
+    encryption_key_nonce: Binary
+
+
+class GetRotationSharingsResult(BaseModel):
+    sharings: list[RotationSharing]
+    next: int | None
+
+
+#### read
+@app.get("/get_rotation_sharings", response_model=GetRotationSharingsResult)
+async def get_rotation_sharings(
+    rotation_id: int,
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+    after: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_ROTATION_BATCH)] = 1000,
+):
+    # get a page of the group's sharings that have no new key staged yet, with their
+    # current keys. sharings created since the rotation started show up here too
+    rotation = await get_pending_rotation(rotation_id, session)
+    staged = exists().where(
+        StagedSharing.rotation_id == rotation_id,
+        StagedSharing.item_id == Sharing.item_id,
+    )
+    query = (
+        select(Sharing.item_id, Sharing.encryption_key, Sharing.encryption_key_nonce)
+        .where(Sharing.group_id == rotation.group_id, ~staged)
+        .order_by(Sharing.item_id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(Sharing.item_id > after)
+
+    page = (await session.execute(query)).all()
+    cursor = page[-1].item_id if len(page) == limit else None
+    return encoding.respond(
+        GetRotationSharingsResult, {"sharings": page, "next": cursor}, response
+    )
+
+
+class RotationMember(BaseModel):
+    user_id: int
+    encryption_key: Binary
+
+
+class GetRotationMembersResult(BaseModel):
+    members: list[RotationMember]
+    next: int | None
+
+
+#### read
+@app.get("/get_rotation_members", response_model=GetRotationMembersResult)
+async def get_rotation_members(
+    rotation_id: int,
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+    after: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_ROTATION_BATCH)] = 1000,
+):
+    # get a page of the group's members that have no new key staged yet, with the
+    # public keys to wrap it with
+    rotation = await get_pending_rotation(rotation_id, session)
+    staged = exists().where(
+        StagedGrouping.rotation_id == rotation_id,
+        StagedGrouping.user_id == Grouping.user_id,
+    )
+    query = (
+        select(Grouping.user_id, User.encryption_key)
+        .join(User, User.id == Grouping.user_id)
+        .where(Grouping.group_id == rotation.group_id, ~staged)
+        .order_by(Grouping.user_id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(Grouping.user_id > after)
+
+    page = (await session.execute(query)).all()
+    cursor = page[-1].user_id if len(page) == limit else None
+    return encoding.respond(
+        GetRotationMembersResult, {"members": page, "next": cursor}, response
+    )
+
+
+class StagedSharingParams(BaseModel):
+    item_id: int
+    encryption_key: Binary
+    encryption_key_nonce: Binary
+
+
+class StagedGroupingParams(BaseModel):
+    user_id: int
+    encryption_key: Binary
+
+
+class StageRotationParams(BaseModel):
+    rotation_id: int
+    sharings: list[StagedSharingParams] = []
+    groupings: list[StagedGroupingParams] = []
+
+
+#### update
+@app.post("/stage_rotation")
+async def stage_rotation(params: StageRotationParams, session: SessionDependency):
+    # stage a batch of rewrapped keys. staging the same row again replaces it, so
+    # batches can safely be retried
+    if len(params.sharings) + len(params.groupings) > MAX_ROTATION_BATCH:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    await get_pending_rotation(params.rotation_id, session)
+
+    if params.sharings:
+        staged = pg_insert(StagedSharing).values(
+            [
+                {"rotation_id": params.rotation_id, **sharing.model_dump()}
+                for sharing in params.sharings
+            ]
+        )
+        await session.execute(
+            staged.on_conflict_do_update(
+                index_elements=[StagedSharing.rotation_id, StagedSharing.item_id],
+                set_={
+                    "encryption_key": staged.excluded.encryption_key,
+                    "encryption_key_nonce": staged.excluded.encryption_key_nonce,
+                },
+            )
+        )
+    if params.groupings:
+        staged = pg_insert(StagedGrouping).values(
+            [
+                {"rotation_id": params.rotation_id, **grouping.model_dump()}
+                for grouping in params.groupings
+            ]
+        )
+        await session.execute(
+            staged.on_conflict_do_update(
+                index_elements=[StagedGrouping.rotation_id, StagedGrouping.user_id],
+                set_={"encryption_key": staged.excluded.encryption_key},
+            )
+        )
+    await session.commit()
+
+
+#### update
+@app.post("/finish_rotation")
+async def finish_rotation(
+    rotation_id: Annotated[int, Form()], session: SessionDependency
+):
+    # swap every staged key in at once. new sharings and groupings need a lock on the
+    # group for their foreign key, so none can sneak in with the old key meanwhile.
+    # anything still missing a new key fails the swap, and shows up when paging
+    rotation = await get_pending_rotation(rotation_id, session, lock=True)
+    group_id = rotation.group_id
+    await session.execute(
+        select(Group.id).where(Group.id == group_id).with_for_update()
+    )
+
+    unstaged = select(
+        exists().where(
+            Sharing.group_id == group_id,
+            ~exists().where(
+                StagedSharing.rotation_id == rotation_id,
+                StagedSharing.item_id == Sharing.item_id,
+            ),
+        )
+        | exists().where(
+            Grouping.group_id == group_id,
+            ~exists().where(
+                StagedGrouping.rotation_id == rotation_id,
+                StagedGrouping.user_id == Grouping.user_id,
+            ),
+        )
+    )
+    if (await session.execute(unstaged)).scalar():
+        raise HTTPException(status.HTTP_409_CONFLICT)
+
+    # only the group's own rows are touched, and only for as long as the swap takes
+    await session.execute(
+        update(Sharing)
+        .where(
+            Sharing.group_id == group_id,
+            StagedSharing.rotation_id == rotation_id,
+            StagedSharing.item_id == Sharing.item_id,
+        )
+        .values(
+            encryption_key=StagedSharing.encryption_key,
+            encryption_key_nonce=StagedSharing.encryption_key_nonce,
+        )
+    )
+    await session.execute(
+        update(Grouping)
+        .where(
+            Grouping.group_id == group_id,
+            StagedGrouping.rotation_id == rotation_id,
+            StagedGrouping.user_id == Grouping.user_id,
+        )
+        .values(encryption_key=StagedGrouping.encryption_key)
+    )
+    await changes.record_from(
+        session,
+        "sharing",
+        "update",
+        select(
+            Sharing.item_id, Sharing.group_id, literal(None, Integer).label("user_id")
+        ).where(Sharing.group_id == group_id),
+    )
+    await changes.record_from(
+        session,
+        "grouping",
+        "update",
+        select(
+            literal(None, Integer).label("item_id"), Grouping.group_id, Grouping.user_id
+        ).where(Grouping.group_id == group_id),
+    )
+
+    await session.execute(
+        delete(StagedSharing).where(StagedSharing.rotation_id == rotation_id)
+    )
+    await session.execute(
+        delete(StagedGrouping).where(StagedGrouping.rotation_id == rotation_id)
+    )
+    rotation.finished_at = datetime.now(UTC)
+    session.add(rotation)
+    await session.commit()
+
+    # every lookup for the group just changed
+    create_lookup_cache().clear()
+
+
+#### delete
+@app.delete("/cancel_rotation")
+async def cancel_rotation(rotation_id: int, session: SessionDependency):
+    # throw away a rotation and everything staged for it
+    rotation = await get_pending_rotation(rotation_id, session, lock=True)
+    await session.delete(rotation)
+    await session.commit()
+
+
+async def get_pending_rotation(
+    rotation_id: int, session: AsyncSession, lock: bool = False
+) -> Rotation:
+    rotation = await session.get(Rotation, rotation_id, with_for_update=lock)
+    if not rotation:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    if rotation.finished_at:
+        raise HTTPException(status.HTTP_409_CONFLICT)
+    return rotation
+
+
+### SHARINGS
+
+
+#### create
+@app.post("/share_with_group")
+async def share_with_group(
+    item_id: Annotated[int, Form()],
+    group_id: Annotated[int, Form()],
+    encryption_key: EncodedBytes,
+    encryption_key_nonce: EncodedBytes,
+    session: SessionDependency,
+):
+    session.add(
+        Sharing(
+            item_id=item_id,
+            group_id=group_id,
+            encryption_key=encryption_key,
+            encryption_key_nonce=encryption_key_nonce,
+        )
+    )
+    await access.grant_sharing(session, item_id, group_id)
+    await changes.record(
+        session, "sharing", "create", item_id=item_id, group_id=group_id
+    )
+    await session.commit()
+    forget_sharing(item_id, group_id)
+
+
+#### read
+@app.get("/get_sharings", response_model=list[SharingSchema])
+async def get_sharings(
+    item_id: int,
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+    if_none_match: IfNoneMatch = None,
+):
+    scope = f"sharings:{item_id}"
+    etag = encoding.etag(make_etag(scope, await changes.version(session, scope)))
+    if matches(if_none_match, etag):
+        return not_modified(etag)
+
+    # get all sharings for a single item.
+    sharing = await session.execute(select(Sharing).where(Sharing.item_id == item_id))
+    response.headers["ETag"] = etag
+    return encoding.respond(list[SharingSchema], sharing.scalars().all(), response)
+
+
+#### read
+@app.get("/get_sharing", response_model=SharingSchema)
+async def get_sharing(
+    item_id: int,
+    group_id: int,
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+):
+    # get sharing for a single user and a single items. most items probed for aren't
+    # shared with the group, so misses are cached too
+    lookups = create_lookup_cache()
+    key = ("sharing", item_id, group_id)
+    sharing = lookups.get(key)
+    if sharing is MISSING:
+        generation = lookups.generation
+        result = await session.execute(
+            select(Sharing)
+            .where(Sharing.group_id == group_id, Sharing.item_id == item_id)
+            .limit(1)
+        )
+        sharing = result.scalar_one_or_none()
+        if sharing is not None:
+            sharing = SharingSchema.model_validate(sharing)
+        lookups.put(key, sharing, generation)
+
+    if sharing is None:
+        raise HTTPException(status.HTTP_403_FORBIDDEN)
+    return encoding.respond(SharingSchema, sharing, response)
+
+
+# most (item, group) pairs that can be looked up in a single batch
+MAX_SHARING_PAIRS: int = 10_000
+
+
+class FindSharingsParams(BaseModel):
+    item_ids: list[int]
+    group_ids: list[int]
+
+
+class SharingPair(BaseModel):
+    item_id: int
+    group_id: int
+
+
+class FindSharingsResult(BaseModel):
+    sharings: dict[int, dict[int, SharingSchema]]
+    missing: list[SharingPair]
+
+
+#### read
+@app.post("/find_sharings", response_model=FindSharingsResult)
+async def find_sharings(
+    params: FindSharingsParams,
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+):
+    # get the sharings between any of the items and any of the groups in a single
+    # query, keyed by item id and then group id. pairs without a sharing are reported
+    # as missing rather than as errors
+    item_ids = list(dict.fromkeys(params.item_ids))
+    group_ids = list(dict.fromkeys(params.group_ids))
+    if len(item_ids) * len(group_ids) > MAX_SHARING_PAIRS:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    result = await session.execute(
+        select(Sharing).where(
+            Sharing.group_id.in_(group_ids), Sharing.item_id.in_(item_ids)
+        )
+    )
+    sharings: dict[int, dict[int, Sharing]] = {}
+    for sharing in result.scalars().all():
+        sharings.setdefault(sharing.item_id, {})[sharing.group_id] = sharing
+
+    missing = [
+        {"item_id": item_id, "group_id": group_id}
+        for item_id in item_ids
+        for group_id in group_ids
+        if group_id not in sharings.get(item_id, {})
+    ]
+    return encoding.respond(
+        FindSharingsResult, {"sharings": sharings, "missing": missing}, response
+    )
+
+
+#### update
+@app.patch("/update_sharing")
+async def update_sharing(
+    item_id: Annotated[int, Form()],
+    group_id: Annotated[int, Form()],
+    encryption_key: EncodedBytes,
+    encryption_key_nonce: EncodedBytes,
+    session: SessionDependency,
+):
+    # get all sharings for a single item.
+    sharing = await session.execute(
+        select(Sharing).where(Sharing.item_id == item_id, Sharing.group_id == group_id)
+    )
+    sharing = sharing.scalar_one()
+    sharing.encryption_key = encryption_key
+    sharing.encryption_key_nonce = encryption_key_nonce
+    session.add(sharing)
+    await changes.record(
+        session, "sharing", "update", item_id=item_id, group_id=group_id
+    )
+    await session.commit()
+    forget_sharing(item_id, group_id)
+
+
+class UnshareFromGroupParams(BaseModel):
+    item_id: int
+    group_id: int
+
+
+#### delete
+@app.delete("/unshare_from_group")
+async def unshare_from_group(
+    params: UnshareFromGroupParams, session: SessionDependency
 ):
     # delete the sharing between the item and the group
     await session.execute(
@@ -359,7 +2180,360 @@ async def unshare_from_group(
             Sharing.item_id == params.item_id, Sharing.group_id == params.group_id
         )
     )
+    await access.revoke_sharing(session, params.item_id, params.group_id)
+    await changes.record(
+        session,
+        "sharing",
+        "delete",
+        item_id=params.item_id,
+        group_id=params.group_id,
+    )
     await session.commit()
+    forget_sharing(params.item_id, params.group_id)
+
+
+##
+## CHANGES
+##
+
+# largest page of changes that can be requested at once
+MAX_CHANGES_LIMIT: int = 1000
+
+# how often old changes are compacted away, in seconds
+COMPACTION_INTERVAL: float = 60 * 60
+
+
+class ChangeEntry(BaseModel):
+    kind: str
+    op: str
+    item_id: int | None
+    group_id: int | None
+    user_id: int | None
+    row: ItemSchema | SharingSchema | GroupingSchema | None
+
+
+class GetChangesResult(BaseModel):
+    changes: list[ChangeEntry]
+    next: str
+    more: bool
+
+
+#### read
+@app.get("/get_changes", response_model=GetChangesResult)
+async def get_changes(
+    user_id: int,
+    session: SessionDependency,
+    response: Response,
+    encoding: EncodingDependency,
+    since: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_CHANGES_LIMIT)] = 500,
+):
+    # get the items, sharings, and groupings visible to a user that were created,
+    # updated, or deleted since the given token, along with the token to pass next
+    # time. without a token, nothing is returned but the token for "now", which
+    # should be taken before doing a full load. a row changed several times is only
+    # reported once, as of its latest change. if the changes since the token have
+    # been compacted away, the client has to do a full load again
+    if since is None:
+        return {"changes": [], "next": await changes.head(session), "more": False}
+
+    try:
+        log, token, more = await changes.read(session, since, user_id, limit)
+    except ValueError:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY) from None
+    except changes.TokenExpired:
+        raise HTTPException(status.HTTP_410_GONE) from None
+
+    latest: dict[tuple, Change] = {}
+    for change in log:
+        key = (change.kind, change.item_id, change.group_id, change.user_id)
+        latest.pop(key, None)
+        latest[key] = change
+
+    # fetch the current state of everything that wasn't deleted, one query per kind
+    live = [change for change in latest.values() if change.op != "delete"]
+    item_ids = [c.item_id for c in live if c.kind == "item"]
+    sharing_keys = [(c.item_id, c.group_id) for c in live if c.kind == "sharing"]
+    grouping_keys = [(c.user_id, c.group_id) for c in live if c.kind == "grouping"]
+
+    rows: dict[tuple, ItemSchema | SharingSchema | GroupingSchema] = {}
+    if item_ids:
+        result = await session.execute(
+            select(*ITEM_METADATA).where(Item.id.in_(item_ids))
+        )
+        rows |= {
+            ("item", row.id, None, None): ItemSchema.model_validate(row)
+            for row in result
+        }
+    if sharing_keys:
+        result = await session.execute(
+            select(Sharing).where(
+                tuple_(Sharing.item_id, Sharing.group_id).in_(sharing_keys)
+            )
+        )
+        rows |= {
+            ("sharing", sharing.item_id, sharing.group_id, None): (
+                SharingSchema.model_validate(sharing)
+            )
+            for sharing in result.scalars().all()
+        }
+    if grouping_keys:
+        result = await session.execute(
+            select(Grouping).where(
+                tuple_(Grouping.user_id, Grouping.group_id).in_(grouping_keys)
+            )
+        )
+        rows |= {
+            ("grouping", None, grouping.group_id, grouping.user_id): (
+                GroupingSchema.model_validate(grouping)
+            )
+            for grouping in result.scalars().all()
+        }
+
+    found = {
+        "changes": [
+            {
+                "kind": change.kind,
+                "op": change.op,
+                "item_id": change.item_id,
+                "group_id": change.group_id,
+                "user_id": change.user_id,
+                "row": rows.get(key),
+            }
+            for key, change in latest.items()
+        ],
+        "next": token,
+        "more": more,
+    }
+    return encoding.respond(GetChangesResult, found, response)
+
+
+# how long a subscription may sit silent before a keepalive is sent, in seconds
+KEEPALIVE_INTERVAL: float = 15
+
+
+#### read
+@app.get("/subscribe")
+async def subscribe(user_id: int, broker: events.BrokerDependency):
+    # push an event to the user whenever something changes in one of their groups,
+    # as server-sent events. the stream opens with a "resync" event, and another is
+    # sent whenever events may have been missed, upon which the client should catch
+    # up through /get_changes. the stream never ends, so it mustn't hold on to a
+    # request-scoped session (and its connection) while it lasts
+    async with create_session() as session:
+        result = await session.execute(
+            select(Grouping.group_id).where(Grouping.user_id == user_id)
+        )
+        group_ids = set(result.scalars().all())
+
+    return StreamingResponse(
+        subscription(broker, user_id, group_ids),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+async def subscription(
+    broker: events.Broker, user_id: int, group_ids: set[int]
+) -> AsyncIterator[str]:
+    subscriber = broker.subscribe(user_id, group_ids)
+    try:
+        yield 'data: {"type":"resync"}\n\n'
+        while not subscriber.overflowed:
+            try:
+                event = await asyncio.wait_for(
+                    subscriber.events.get(), KEEPALIVE_INTERVAL
+                )
+            except TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"data: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+        # the client fell too far behind, so it has to reconnect and resync
+        yield 'data: {"type":"resync"}\n\n'
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+async def compact_changes():
+    # drop changes old enough that no client should still be syncing from them
+    async with create_session() as session:
+        await changes.compact(session)
+        await session.commit()
+
+
+class RekeyedSharing(BaseModel):
+    group_id: int
+    encryption_key: Binary
+    encryption_key_nonce: Binary
+
+
+class RekeyItemParams(BaseModel):
+    sharings: list[RekeyedSharing]
+    revoke: list[int]
+
+
+#### update
+@app.post("/rekey_item")
+async def rekey_item(
+    item_id: Annotated[int, Form()],
+    content_nonce: EncodedBytes,
+    content: UploadFile,
+    keys: Annotated[str, Form()],
+    session: SessionDependency,
+    blobs: BlobStoreDependency,
+    variant_uploads: VariantUploadsDependency,
+    if_match: IfMatch = None,
+):
+    # replace an item's content with a re-encryption under a new key, re-wrap that key
+    # for every group that keeps access, and revoke the rest, all at once. `keys` is
+    # a JSON object of the re-wrapped `sharings` and the group ids to `revoke`, which
+    # together must cover every current sharing of the item. `If-Match` carries the
+    # ETag of the content that was re-encrypted, so a concurrent edit is never lost
+    try:
+        params = RekeyItemParams.model_validate_json(keys)
+    except ValidationError:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY) from None
+
+    if if_match is None:
+        # a rekey must never overwrite content its client hasn't seen
+        raise HTTPException(status.HTTP_428_PRECONDITION_REQUIRED)
+
+    digests: list[str] = []
+    try:
+        digest, size = await ingest(iter_upload(content), blobs)
+        digests.append(digest)
+        variants = await ingest_variants(variant_uploads.uploads, blobs, digests)
+        previous_digests = await apply_rekey(
+            item_id, content_nonce, digest, size, params, if_match, session
+        )
+        await store_variants(item_id, variants, session)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        for digest in digests:
+            await release_blob(digest, session, blobs)
+        raise
+
+    create_content_cache().invalidate(item_id)
+    for group_id in [sharing.group_id for sharing in params.sharings] + params.revoke:
+        forget_sharing(item_id, group_id)
+
+    for previous_digest in previous_digests:
+        await release_blob(previous_digest, session, blobs)
+
+
+async def apply_rekey(
+    item_id: int,
+    content_nonce: bytes,
+    digest: str,
+    size: int,
+    params: RekeyItemParams,
+    if_match: str,
+    session: AsyncSession,
+) -> list[str]:
+    # point the item at its new content and swap its sharings over, returning the
+    # digests of the blobs it no longer uses. the caller commits
+    item = await session.get(Item, item_id, with_for_update=True)
+    if not item:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    if item.segment_size:
+        raise HTTPException(status.HTTP_409_CONFLICT)
+    if not strongly_matches(if_match, blob_etag(item.digest)):
+        raise HTTPException(status.HTTP_412_PRECONDITION_FAILED)
+
+    # new sharings can't be created while the item is locked, so the set checked here
+    # is the set that gets rekeyed
+    result = await session.execute(
+        select(Sharing.group_id).where(Sharing.item_id == item_id)
+    )
+    current = set(result.scalars().all())
+    kept = [sharing.group_id for sharing in params.sharings]
+    revoked = set(params.revoke)
+    if len(set(kept)) != len(kept) or revoked & set(kept):
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if current != revoked | set(kept):
+        raise HTTPException(status.HTTP_409_CONFLICT)
+
+    previous_digests = [item.digest]
+    item.digest, item.size, item.content_nonce = digest, size, content_nonce
+    session.add(item)
+
+    # rewrap every kept sharing in a single statement
+    if params.sharings:
+        rekeyed = values(
+            column("group_id", Integer),
+            column("encryption_key", LargeBinary),
+            column("encryption_key_nonce", LargeBinary),
+            name="rekeyed",
+        ).data(
+            [
+                (sharing.group_id, sharing.encryption_key, sharing.encryption_key_nonce)
+                for sharing in params.sharings
+            ]
+        )
+        await session.execute(
+            update(Sharing)
+            .where(Sharing.item_id == item_id, Sharing.group_id == rekeyed.c.group_id)
+            .values(
+                encryption_key=rekeyed.c.encryption_key,
+                encryption_key_nonce=rekeyed.c.encryption_key_nonce,
+            )
+        )
+    if revoked:
+        await session.execute(
+            delete(Sharing).where(
+                Sharing.item_id == item_id, Sharing.group_id.in_(revoked)
+            )
+        )
+    for group_id in revoked:
+        await access.revoke_sharing(session, item_id, group_id)
+
+    # the old variants were encrypted with the old key
+    result = await session.execute(
+        delete(Variant).where(Variant.item_id == item_id).returning(Variant.digest)
+    )
+    previous_digests += result.scalars().all()
+
+    await changes.record_all(
+        session,
+        [Change(kind="item", op="update", item_id=item_id)]
+        + [
+            Change(kind="sharing", op="update", item_id=item_id, group_id=group_id)
+            for group_id in kept
+        ]
+        + [
+            Change(kind="sharing", op="delete", item_id=item_id, group_id=group_id)
+            for group_id in revoked
+        ],
+    )
+
+    return previous_digests
+
+
+##
+## LIMITS
+##
+
+# room for the form fields and multipart framing around uploaded files
+FORM_OVERHEAD: int = 64 * 1024
+
+# content, along with every variant, as uploaded to create, update, or rekey an item
+MAX_ITEM_UPLOAD_SIZE: int = (
+    MAX_BLOB_SIZE + len(get_args(VariantName)) * MAX_VARIANT_SIZE + FORM_OVERHEAD
+)
+
+# largest request body each upload endpoint accepts, checked against the declared
+# length before any of it is spooled
+MAX_REQUEST_SIZES: dict[str, int] = {
+    "/create_item": MAX_ITEM_UPLOAD_SIZE,
+    "/update_item": MAX_ITEM_UPLOAD_SIZE,
+    "/rekey_item": MAX_ITEM_UPLOAD_SIZE,
+    "/put_segment": MAX_BLOB_SIZE + FORM_OVERHEAD,
+    "/put_variant": MAX_VARIANT_SIZE + FORM_OVERHEAD,
+}
+
+app.add_middleware(ContentLengthLimit, limits=MAX_REQUEST_SIZES)
 
 
 app.mount("/", StaticFiles(directory="ui", html=True), name="static")
@@ -0,0 +1,215 @@
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from functools import cache
+from typing import Any, NamedTuple
+
+# total size of the content kept open in the cache
+CONTENT_CACHE_SIZE: int = 256 * 1024 * 1024
+
+# largest content kept in the cache. anything bigger would evict too much to be
+# worth it, and is served straight from the store instead
+MAX_CACHED_CONTENT: int = 16 * 1024 * 1024
+
+# most lookups kept in the cache
+LOOKUP_CACHE_SIZE: int = 100_000
+
+# how long a lookup is trusted for, in seconds. invalidation should make this moot,
+# it only bounds how long a missed invalidation can go unnoticed
+LOOKUP_TTL: float = 60
+
+# most public user records kept in the directory cache, and how long they are
+# trusted for, in seconds. public keys never change, so only eviction matters
+DIRECTORY_CACHE_SIZE: int = 50_000
+DIRECTORY_TTL: float = 60 * 60
+
+# stands in for lookups that aren't in the cache, since None is a valid result
+MISSING: Any = object()
+
+
+class CachedContent(NamedTuple):
+    digest: str
+    content: bytes | memoryview
+
+
+class ContentCache:
+    """
+    A least-recently-used cache of item content, bounded by the total size of its
+    entries rather than their number. Concurrent misses for the same item share a
+    single load.
+
+    Only content held in memory is cached, so that the bound is a real memory bound.
+    Loads too large to be cached are free to return a view over a mapping instead,
+    which is passed through to the requests waiting on it without being kept.
+
+    Entries are keyed by item id and carry the digest of the content they hold,
+    which doubles as its version. Entries are invalidated when an item changes,
+    locally by the writer and in other processes by their change notifications.
+    """
+
+    def __init__(self, max_size: int, max_entry_size: int):
+        self.max_size = max_size
+        self.max_entry_size = max_entry_size
+        self.size = 0
+        self._entries: OrderedDict[int, CachedContent] = OrderedDict()
+        self._loads: dict[int, asyncio.Task[CachedContent]] = {}
+        # bumped by every invalidation, so that loads racing one are not cached
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._entries
+
+    async def get(
+        self, item_id: int, load: Callable[[], Awaitable[CachedContent]]
+    ) -> CachedContent:
+        if (entry := self._entries.get(item_id)) is not None:
+            self._entries.move_to_end(item_id)
+            self.hits += 1
+            return entry
+
+        # loads run on their own, so that one of the requests waiting on a load going
+        # away doesn't cancel it for the rest
+        task = self._loads.get(item_id)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._load(item_id, load, self._generation))
+            self._loads[item_id] = task
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _load(
+        self,
+        item_id: int,
+        load: Callable[[], Awaitable[CachedContent]],
+        generation: int,
+    ) -> CachedContent:
+        # the generation is taken when the load is started, not when it first runs
+        task = asyncio.current_task()
+        try:
+            entry = await load()
+        finally:
+            # an invalidation may have let a newer load take its place already
+            if self._loads.get(item_id) is task:
+                del self._loads[item_id]
+
+        if generation == self._generation:
+            self._put(item_id, entry)
+        return entry
+
+    def _put(self, item_id: int, entry: CachedContent):
+        size = len(entry.content)
+        if size > self.max_entry_size or not isinstance(entry.content, bytes):
+            return
+
+        if (previous := self._entries.pop(item_id, None)) is not None:
+            self.size -= len(previous.content)
+        self._entries[item_id] = entry
+        self.size += size
+        while self.size > self.max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted.content)
+            self.evictions += 1
+
+    def invalidate(self, item_id: int):
+        # requests arriving from now on must not join a load of the old content
+        self._generation += 1
+        self._loads.pop(item_id, None)
+        if (entry := self._entries.pop(item_id, None)) is not None:
+            self.size -= len(entry.content)
+
+    def clear(self):
+        self._generation += 1
+        self._loads.clear()
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
+
+
+class LookupCache:
+    """
+    A least-recently-used cache of small lookups, like memberships and sharings.
+    Negative results are cached just like positive ones, since most lookups are for
+    things that don't exist.
+
+    Entries are invalidated precisely as the rows behind them change, and expire
+    after a while regardless.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        # bumped by every invalidation, so that lookups racing one are not cached.
+        # read it before looking something up, and hand it back when caching it
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return MISSING
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any, generation: int):
+        if generation != self.generation:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *keys: Hashable):
+        self.generation += 1
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+@cache
+def create_content_cache() -> ContentCache:
+    return ContentCache(CONTENT_CACHE_SIZE, MAX_CACHED_CONTENT)
+
+
+@cache
+def create_lookup_cache() -> LookupCache:
+    return LookupCache(LOOKUP_CACHE_SIZE, LOOKUP_TTL)
+
+
+@cache
+def create_directory_cache() -> LookupCache:
+    return LookupCache(DIRECTORY_CACHE_SIZE, DIRECTORY_TTL)
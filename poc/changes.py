@@ -0,0 +1,204 @@
+"""
+The change log. Every write to items, sharings, and groupings appends an entry in the
+same transaction, so that clients can sync incrementally instead of reloading
+everything.
+
+Changes are read in transaction order rather than id order. ids are handed out as
+changes are written, but transactions commit in any order, so a reader could see
+change 11 before change 10 commits and then skip it forever. Instead, a reader only
+returns changes made by transactions older than the oldest one still in flight (the
+xmin of its snapshot), since those can no longer gain new changes.
+
+Every change also bumps the version of each listing it affects, which is what entity
+tags for those listings are derived from.
+"""
+
+from datetime import timedelta
+
+from sqlalchemy import (
+    Select,
+    String,
+    and_,
+    cast,
+    delete,
+    func,
+    literal,
+    or_,
+    select,
+    text,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Access, Change, Compaction, Grouping, Version
+
+# how long changes are kept before being compacted away
+CHANGE_RETENTION = timedelta(days=7)
+
+
+class TokenExpired(Exception):
+    """The changes since a token have been compacted away, and a full sync is needed."""
+
+
+async def record(
+    session: AsyncSession,
+    kind: str,
+    op: str,
+    *,
+    item_id: int | None = None,
+    group_id: int | None = None,
+    user_id: int | None = None,
+):
+    await record_all(
+        session,
+        [Change(kind=kind, op=op, item_id=item_id, group_id=group_id, user_id=user_id)],
+    )
+
+
+async def record_all(session: AsyncSession, entries: list[Change]):
+    """Record several changes at once, bumping every affected listing only once."""
+    session.add_all(entries)
+
+    # sorted, so that concurrent writers lock versions in the same order
+    scopes = sorted({_scope(change) for change in entries})
+    await session.execute(
+        insert(Version)
+        .values([{"scope": scope, "version": 1} for scope in scopes])
+        .on_conflict_do_update(
+            index_elements=[Version.scope], set_={"version": Version.version + 1}
+        )
+    )
+
+
+async def record_from(session: AsyncSession, kind: str, op: str, rows: Select):
+    """
+    Record a change for every row of a query selecting `item_id`, `group_id`, and
+    `user_id`, without ever loading them.
+    """
+    keys = rows.subquery()
+    await session.execute(
+        insert(Change).from_select(
+            ["kind", "op", "item_id", "group_id", "user_id"],
+            select(
+                literal(kind),
+                literal(op),
+                keys.c.item_id,
+                keys.c.group_id,
+                keys.c.user_id,
+            ),
+        )
+    )
+
+    scope = {
+        "item": literal("items"),
+        "sharing": "sharings:" + cast(keys.c.item_id, String),
+        "grouping": "memberships:" + cast(keys.c.user_id, String),
+    }[kind].label("scope")
+    await session.execute(
+        insert(Version)
+        .from_select(
+            ["scope", "version"],
+            select(scope, literal(1)).distinct().order_by(scope),
+        )
+        .on_conflict_do_update(
+            index_elements=[Version.scope], set_={"version": Version.version + 1}
+        )
+    )
+
+
+def _scope(change: Change) -> str:
+    # the listing that includes the changed row
+    return {
+        "item": "items",
+        "sharing": f"sharings:{change.item_id}",
+        "grouping": f"memberships:{change.user_id}",
+    }[change.kind]
+
+
+async def version(session: AsyncSession, scope: str) -> int:
+    """
+    Return the current version of a listing. it has to be read before the listing
+    itself, so that a concurrent change can only ever make the version look older
+    than the listing, never newer.
+    """
+    result = await session.execute(
+        select(Version.version).where(Version.scope == scope)
+    )
+    return result.scalar_one_or_none() or 0
+
+
+def encode_token(txid: int, change_id: int) -> str:
+    return f"{txid}.{change_id}"
+
+
+def decode_token(token: str) -> tuple[int, int]:
+    txid, change_id = map(int, token.split("."))
+    return txid, change_id
+
+
+async def _xmin(session: AsyncSession) -> int:
+    result = await session.execute(
+        text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+    )
+    return result.scalar_one()
+
+
+async def head(session: AsyncSession) -> str:
+    """Return a token that is past every change made so far."""
+    return encode_token(await _xmin(session), 0)
+
+
+async def read(
+    session: AsyncSession, token: str, user_id: int, limit: int
+) -> tuple[list[Change], str, bool]:
+    """
+    Return the changes visible to a user since the given token, the token to resume
+    from, and whether there are more changes to read.
+    """
+    since = decode_token(token)
+    horizon = await session.execute(select(func.max(Compaction.through_txid)))
+    through = horizon.scalar_one()
+    if through is not None and since[0] <= through:
+        raise TokenExpired
+
+    xmin = await _xmin(session)
+    groups = select(Grouping.group_id).where(Grouping.user_id == user_id)
+    items = select(Access.item_id).where(Access.user_id == user_id)
+    result = await session.execute(
+        select(Change)
+        .where(
+            tuple_(Change.txid, Change.id) > tuple_(*since),
+            Change.txid < xmin,
+            or_(
+                and_(Change.kind == "item", Change.item_id.in_(items)),
+                and_(Change.kind == "sharing", Change.group_id.in_(groups)),
+                and_(Change.kind == "grouping", Change.user_id == user_id),
+            ),
+        )
+        .order_by(Change.txid, Change.id)
+        .limit(limit + 1)
+    )
+    changes = list(result.scalars().all())
+    if len(changes) > limit:
+        last = changes[limit - 1]
+        return changes[:limit], encode_token(last.txid, last.id), True
+
+    return changes, encode_token(xmin, 0), False
+
+
+async def compact(session: AsyncSession, retention: timedelta = CHANGE_RETENTION):
+    """
+    Drop every change made by a transaction older than the retention period. whole
+    transactions are dropped at once, so that tokens can be checked against the
+    newest of them.
+    """
+    result = await session.execute(
+        select(func.max(Change.txid)).where(Change.created_at < func.now() - retention)
+    )
+    through = result.scalar_one()
+    if through is None:
+        return
+
+    await session.execute(delete(Change).where(Change.txid <= through))
+    session.add(Compaction(through_txid=through))
@@ -0,0 +1,43 @@
+from hashlib import sha256
+
+from fastapi import status
+from fastapi.responses import Response
+
+
+def make_etag(*parts: object) -> str:
+    """Build a strong entity tag out of everything that identifies a representation."""
+    key = "\0".join(map(str, parts)).encode()
+    return f'"{sha256(key).hexdigest()[:32]}"'
+
+
+def blob_etag(digest: str) -> str:
+    # blobs are content-addressed, so their digest already identifies their bytes
+    return f'"{digest}"'
+
+
+def matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Check whether an `If-None-Match` header matches the given entity tag, using the
+    weak comparison the header calls for.
+    """
+    if not if_none_match:
+        return False
+
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in [
+        candidate.removeprefix("W/") for candidate in candidates
+    ]
+
+
+def strongly_matches(if_match: str, etag: str) -> bool:
+    """
+    Check whether an `If-Match` header names the given entity tag exactly, using the
+    strong comparison a write depends on. weak tags and `*` never match, since they
+    don't say which content the client has seen.
+    """
+    candidates = [candidate.strip() for candidate in if_match.split(",")]
+    return etag in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
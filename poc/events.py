@@ -0,0 +1,177 @@
+"""
+Pushes changes to connected clients as they happen.
+
+Every entry appended to the change log is announced by a trigger with a `NOTIFY` on
+the `changes` channel, which is delivered once the writing transaction commits. Each
+process holds a single connection that `LISTEN`s on that channel, and fans every
+notification out to the subscribers in the same process that can see it. Clients
+use events as a cue to pull the details from `/get_changes`.
+"""
+
+import asyncio
+import json
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import cache
+from typing import Annotated, Any
+
+import asyncpg
+from fastapi import Depends
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+
+from .db import DB_URL, create_session
+from .models import Sharing
+
+CHANNEL = "changes"
+
+# events buffered for a subscriber before it is considered too slow and cut off
+MAX_PENDING_EVENTS: int = 256
+
+# how long to wait before reconnecting to the database, in seconds
+RECONNECT_DELAY: float = 5
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(eq=False)
+class Subscriber:
+    user_id: int
+    group_ids: set[int]
+    events: asyncio.Queue[dict[str, Any]] = field(
+        default_factory=lambda: asyncio.Queue(MAX_PENDING_EVENTS)
+    )
+    # set once events have been dropped, after which the subscriber has to resync
+    overflowed: bool = False
+
+
+class Broker:
+    """Fans notifications from one database connection out to many subscribers."""
+
+    def __init__(self, db_url: str):
+        url = make_url(db_url).set(drivername="postgresql")
+        self._dsn = url.render_as_string(hide_password=False)
+        self._inbox: asyncio.Queue[str] = asyncio.Queue()
+        self._by_user: dict[int, set[Subscriber]] = {}
+        self._by_group: dict[int, set[Subscriber]] = {}
+        self._watchers: list[Callable[[dict[str, Any]], None]] = []
+
+    def watch(self, watcher: Callable[[dict[str, Any]], None]):
+        """
+        Call the given function with every event seen by this process, regardless of
+        who it is for. a "resync" event means that events may have been missed.
+        """
+        self._watchers.append(watcher)
+
+    def subscribe(self, user_id: int, group_ids: set[int]) -> Subscriber:
+        subscriber = Subscriber(user_id, set(group_ids))
+        self._by_user.setdefault(user_id, set()).add(subscriber)
+        for group_id in group_ids:
+            self._by_group.setdefault(group_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._discard(self._by_user, subscriber.user_id, subscriber)
+        for group_id in subscriber.group_ids:
+            self._discard(self._by_group, group_id, subscriber)
+
+    @staticmethod
+    def _discard(index: dict[int, set[Subscriber]], key: int, subscriber: Subscriber):
+        subscribers = index.get(key)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del index[key]
+
+    async def run(self):
+        await asyncio.gather(self._listen(), self._dispatch())
+
+    async def _listen(self):
+        # hold a single listening connection, reconnecting whenever it drops
+        while True:
+            try:
+                connection = await asyncpg.connect(self._dsn)
+            except Exception:
+                logger.exception("failed to connect the change listener")
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _, closed=closed: closed.set())
+            try:
+                await connection.add_listener(CHANNEL, self._receive)
+                # anything could have happened while disconnected
+                for watcher in self._watchers:
+                    watcher({"type": "resync"})
+                for subscribers in self._by_user.values():
+                    for subscriber in subscribers:
+                        self._push(subscriber, {"type": "resync"})
+                await closed.wait()
+            finally:
+                await connection.close()
+
+    def _receive(self, _connection, _pid, _channel, payload: str):
+        self._inbox.put_nowait(payload)
+
+    async def _dispatch(self):
+        while True:
+            payload = await self._inbox.get()
+            try:
+                await self._publish(json.loads(payload))
+            except Exception:
+                logger.exception("failed to publish change %s", payload)
+
+    async def _publish(self, change: dict[str, Any]):
+        event = {"type": "change", **change}
+        for watcher in self._watchers:
+            watcher(event)
+
+        group_id, user_id = change["group_id"], change["user_id"]
+        if change["kind"] == "grouping":
+            # keep track of the groups that subscribed users join and leave
+            for subscriber in list(self._by_user.get(user_id, ())):
+                if change["op"] == "delete":
+                    subscriber.group_ids.discard(group_id)
+                    self._discard(self._by_group, group_id, subscriber)
+                else:
+                    subscriber.group_ids.add(group_id)
+                    self._by_group.setdefault(group_id, set()).add(subscriber)
+                self._push(subscriber, event)
+            return
+
+        if change["kind"] == "sharing":
+            group_ids = [group_id]
+        elif not self._by_group:
+            return
+        else:
+            # an item is visible to every group it is shared with
+            async with create_session() as session:
+                result = await session.execute(
+                    select(Sharing.group_id).where(Sharing.item_id == change["item_id"])
+                )
+                group_ids = result.scalars().all()
+
+        recipients = set()
+        for group_id in group_ids:
+            recipients |= self._by_group.get(group_id, set())
+        for subscriber in recipients:
+            self._push(subscriber, event)
+
+    def _push(self, subscriber: Subscriber, event: dict[str, Any]):
+        try:
+            subscriber.events.put_nowait(event)
+        except asyncio.QueueFull:
+            subscriber.overflowed = True
+
+
+@cache
+def create_broker(db_url: str = DB_URL) -> Broker:
+    return Broker(db_url)
+
+
+def _dependency() -> Broker:
+    return create_broker()
+
+
+BrokerDependency = Annotated[Broker, Depends(_dependency)]
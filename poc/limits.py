@@ -0,0 +1,32 @@
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class ContentLengthLimit:
+    """
+    Rejects requests to the given paths whose declared body is larger than the path
+    accepts, before any of it is read.
+
+    Multipart bodies are parsed (and spooled to disk) in full before an endpoint ever
+    runs, so the limits enforced while ingesting them come too late to bound the disk
+    space and time a request can take up. those limits still apply on top of this.
+    """
+
+    def __init__(self, app: ASGIApp, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is not None:
+            headers = dict(scope["headers"])
+            length = headers.get(b"content-length", b"")
+            if not length.isdigit():
+                # a body of unknown length can't be checked up front
+                response = JSONResponse({"detail": "Length Required"}, 411)
+                return await response(scope, receive, send)
+            if int(length) > limit:
+                response = JSONResponse({"detail": "Content Too Large"}, 413)
+                return await response(scope, receive, send)
+
+        await self.app(scope, receive, send)
@@ -1,4 +1,14 @@
-from sqlalchemy import ForeignKey
+from datetime import datetime
+
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    ForeignKey,
+    Index,
+    UniqueConstraint,
+    func,
+    text,
+)
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, Mapped, MappedAsDataclass, mapped_column
 
@@ -11,11 +21,25 @@ class User(Base):
     """User model"""
 
     __tablename__ = "users"
+    __table_args__ = (
+        # emails are unique regardless of case, and looked up and searched lowercased
+        Index("ix_users_email_lower", text("lower(email)"), unique=True),
+        # byte order, so that prefix searches and their ordering share one index
+        Index("ix_users_email_lower_prefix", text('lower(email) COLLATE "C"')),
+        Index(
+            "ix_users_email_lower_trgm",
+            text("lower(email) gin_trgm_ops"),
+            postgresql_using="gin",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, init=False)
-    email: Mapped[str] = mapped_column(index=True)
-    encryption_key: Mapped[str]  # user's public key
-    encryption_key_salt: Mapped[str]  # salt used to gen key pair
+    email: Mapped[str]
+    encryption_key: Mapped[bytes]  # user's public key
+    encryption_key_salt: Mapped[bytes]  # salt used to gen key pair
+    private_group_id: Mapped[int | None] = mapped_column(
+        ForeignKey("groups.id", use_alter=True), default=None
+    )  # the user's personal group, ie. the first group they host
 
 
 class Group(Base):
@@ -37,20 +61,70 @@ class Item(Base):
     __tablename__ = "items"
 
     id: Mapped[int] = mapped_column(primary_key=True, init=False)
-    content: Mapped[bytes]  # content encrypted with a symmetric encryption key
-    content_nonce: Mapped[str]  # random value used for content encryption
+    content_nonce: Mapped[
+        bytes | None
+    ]  # random value used for content encryption. null for segmented items
+    size: Mapped[int] = mapped_column(BigInteger)  # size of the encrypted content
+    digest: Mapped[str | None] = mapped_column(
+        index=True
+    )  # hex-encoded sha256 of the encrypted content, and its address in the blob store. null for segmented items
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), init=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        init=False,
+    )
+    segment_size: Mapped[int | None] = mapped_column(
+        default=None
+    )  # size of each plaintext segment, if the content is split into individually encrypted segments
+
+
+class Segment(Base):
+    """Segment model: an individually encrypted, fixed-size slice of an item's content"""
+
+    __tablename__ = "segments"
+    __table_args__ = (UniqueConstraint("item_id", "index"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, init=False)
+    item_id: Mapped[int] = mapped_column(ForeignKey("items.id"), index=True)
+    index: Mapped[int]  # position of the segment within the item
+    nonce: Mapped[bytes]  # random value used for segment encryption
+    size: Mapped[int] = mapped_column(BigInteger)  # size of the encrypted segment
+    digest: Mapped[str] = mapped_column(
+        index=True
+    )  # hex-encoded sha256 of the encrypted segment, and its address in the blob store
+
+
+class Variant(Base):
+    """Variant model: a separately encrypted rendition of an item, like a thumbnail"""
+
+    __tablename__ = "variants"
+    __table_args__ = (UniqueConstraint("item_id", "name"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, init=False)
+    item_id: Mapped[int] = mapped_column(ForeignKey("items.id"), index=True)
+    name: Mapped[str]  # kind of rendition, ie. "thumb" or "preview"
+    nonce: Mapped[bytes]  # random value used for variant encryption
+    size: Mapped[int] = mapped_column(BigInteger)  # size of the encrypted variant
+    digest: Mapped[str] = mapped_column(
+        index=True
+    )  # hex-encoded sha256 of the encrypted variant, and its address in the blob store
 
 
 class Grouping(Base):
     """Grouping model: a connection between a user and a group (membership)"""
 
     __tablename__ = "groupings"
+    __table_args__ = (Index("ix_groupings_user_id_group_id", "user_id", "group_id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, init=False)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     group_id: Mapped[int] = mapped_column(ForeignKey("groups.id"), index=True)
     encryption_key: Mapped[
-        str
+        bytes
     ]  # group's symmetric key encrypted with user's public key
 
 
@@ -58,11 +132,145 @@ class Sharing(Base):
     """Sharing model: a connection between an item and a group (permission)"""
 
     __tablename__ = "sharings"
+    __table_args__ = (Index("ix_sharings_group_id_item_id", "group_id", "item_id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, init=False)
     group_id: Mapped[int] = mapped_column(ForeignKey("groups.id"), index=True)
     item_id: Mapped[int] = mapped_column(ForeignKey("items.id"), index=True)
     encryption_key: Mapped[
-        str
+        bytes
     ]  # item's symmetric key encrypted with groups's symmetric key
-    encryption_key_nonce: Mapped[str]  # random value used for key encryption
+    encryption_key_nonce: Mapped[bytes]  # random value used for key encryption
+
+
+class Upload(Base):
+    """Upload model: a resumable upload of an item's encrypted content in chunks"""
+
+    __tablename__ = "uploads"
+
+    id: Mapped[str] = mapped_column(primary_key=True)  # random, unguessable token
+    owner_user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    size: Mapped[int] = mapped_column(BigInteger)  # total size of the encrypted content
+    content_nonce: Mapped[bytes]  # random value used for content encryption
+    encryption_key: Mapped[
+        bytes
+    ]  # item's symmetric key encrypted with the owner's private group's key
+    encryption_key_nonce: Mapped[bytes]  # random value used for key encryption
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), index=True
+    )  # abandoned uploads are discarded after this point
+
+
+class UploadChunk(Base):
+    """UploadChunk model: a range of an upload's content that has been received"""
+
+    __tablename__ = "upload_chunks"
+
+    id: Mapped[int] = mapped_column(primary_key=True, init=False)
+    upload_id: Mapped[str] = mapped_column(
+        ForeignKey("uploads.id", ondelete="CASCADE"), index=True
+    )
+    offset: Mapped[int] = mapped_column(BigInteger)
+    size: Mapped[int] = mapped_column(BigInteger)
+
+
+class Access(Base):
+    """Access model: which items a user can see, and through which group. derived
+    from groupings and sharings, and maintained alongside them"""
+
+    __tablename__ = "accesses"
+    __table_args__ = (
+        Index("ix_accesses_user_id_via_group_id", "user_id", "via_group_id", "item_id"),
+        Index("ix_accesses_via_group_id_item_id", "via_group_id", "item_id"),
+    )
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    item_id: Mapped[int] = mapped_column(ForeignKey("items.id"), primary_key=True)
+    via_group_id: Mapped[int] = mapped_column(ForeignKey("groups.id"), primary_key=True)
+
+
+class Change(Base):
+    """Change model: an entry in the log of item, sharing, and grouping mutations"""
+
+    __tablename__ = "changes"
+    __table_args__ = (Index("ix_changes_txid_id", "txid", "id"),)
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, init=False)
+    txid: Mapped[int] = mapped_column(
+        BigInteger,
+        server_default=text("pg_current_xact_id()::text::bigint"),
+        init=False,
+    )  # the transaction that made the change. changes are read in transaction order
+    kind: Mapped[str]  # "item", "sharing", or "grouping"
+    op: Mapped[str]  # "create", "update", or "delete"
+    item_id: Mapped[int | None] = mapped_column(default=None)
+    group_id: Mapped[int | None] = mapped_column(default=None, index=True)
+    user_id: Mapped[int | None] = mapped_column(default=None)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), init=False, index=True
+    )
+
+
+class Compaction(Base):
+    """Compaction model: a record of old changes having been dropped from the log"""
+
+    __tablename__ = "compactions"
+
+    id: Mapped[int] = mapped_column(primary_key=True, init=False)
+    through_txid: Mapped[int] = mapped_column(
+        BigInteger
+    )  # every change made by this transaction or an earlier one was dropped
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), init=False
+    )
+
+
+class Version(Base):
+    """Version model: a counter bumped whenever anything in a listing changes"""
+
+    __tablename__ = "versions"
+
+    scope: Mapped[str] = mapped_column(
+        primary_key=True
+    )  # eg. "items", "sharings:<item id>", or "memberships:<user id>"
+    version: Mapped[int] = mapped_column(BigInteger)
+
+
+class Rotation(Base):
+    """Rotation model: a replacement of a group's key, staged before being swapped in"""
+
+    __tablename__ = "rotations"
+
+    id: Mapped[int] = mapped_column(primary_key=True, init=False)
+    group_id: Mapped[int] = mapped_column(ForeignKey("groups.id"), index=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), init=False
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), default=None
+    )
+
+
+class StagedGrouping(Base):
+    """StagedGrouping model: a member's copy of a group's new key, awaiting a swap"""
+
+    __tablename__ = "staged_groupings"
+
+    rotation_id: Mapped[int] = mapped_column(
+        ForeignKey("rotations.id", ondelete="CASCADE"), primary_key=True
+    )
+    user_id: Mapped[int] = mapped_column(primary_key=True)
+    encryption_key: Mapped[bytes]  # group's new key encrypted with user's public key
+
+
+class StagedSharing(Base):
+    """StagedSharing model: an item's key wrapped with a group's new key, awaiting a swap"""
+
+    __tablename__ = "staged_sharings"
+
+    rotation_id: Mapped[int] = mapped_column(
+        ForeignKey("rotations.id", ondelete="CASCADE"), primary_key=True
+    )
+    item_id: Mapped[int] = mapped_column(primary_key=True)
+    encryption_key: Mapped[bytes]  # item's key encrypted with group's new key
+    encryption_key_nonce: Mapped[bytes]  # random value used for key encryption
@@ -0,0 +1,175 @@
+from collections.abc import AsyncIterator
+from secrets import token_hex
+
+from fastapi import status
+from fastapi.responses import Response, StreamingResponse
+
+# size of the slices handed to the server when streaming content. large enough to
+# keep per-chunk overhead negligible, small enough to keep slow clients cheap
+CHUNK_SIZE: int = 256 * 1024
+
+# requests asking for more ranges than this are served in full instead
+MAX_RANGES: int = 16
+
+
+def parse_ranges(header: str | None, size: int) -> list[tuple[int, int]] | None:
+    """
+    Parse a `Range` header into a sorted list of inclusive, non-overlapping
+    `(start, end)` byte ranges within a resource of the given size.
+
+    Returns None if the header is absent, malformed, or asks for too many ranges (in
+    which case the full content should be sent), and an empty list if none of the
+    requested ranges can be satisfied.
+    """
+    if not header:
+        return None
+
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+
+    parts = spec.split(",")
+    if len(parts) > MAX_RANGES:
+        return None
+
+    ranges: list[tuple[int, int]] = []
+    for part in parts:
+        first, sep, last = part.strip().partition("-")
+        if not sep:
+            return None
+
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if last and end < start:
+                    return None
+            elif last:
+                # suffix range, ie. the final N bytes
+                start, end = max(size - int(last), 0), size - 1
+            else:
+                return None
+        except ValueError:
+            return None
+
+        if start < 0 or end < 0:
+            return None
+        if start < size and end >= start:
+            ranges.append((start, min(end, size - 1)))
+
+    return coalesce(ranges)
+
+
+def coalesce(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    Merge overlapping and adjacent inclusive `(start, end)` ranges, returning them in
+    ascending order.
+    """
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+async def slices(
+    content: memoryview, start: int, end: int, chunk_size: int
+) -> AsyncIterator[memoryview]:
+    # slicing a memoryview is zero-copy, so each chunk is just a window over the
+    # underlying buffer
+    for offset in range(start, end + 1, chunk_size):
+        yield content[offset : min(offset + chunk_size, end + 1)]
+
+
+async def _multipart(
+    content: memoryview,
+    ranges: list[tuple[int, int]],
+    headers: list[bytes],
+    closing: bytes,
+    chunk_size: int,
+) -> AsyncIterator[bytes | memoryview]:
+    for (start, end), header in zip(ranges, headers, strict=True):
+        yield header
+        async for chunk in slices(content, start, end, chunk_size):
+            yield chunk
+    yield closing
+
+
+def content_response(
+    content: bytes | memoryview,
+    range_header: str | None = None,
+    media_type: str = "application/octet-stream",
+    chunk_size: int = CHUNK_SIZE,
+    headers: dict[str, str] | None = None,
+    etag: str | None = None,
+    if_range: str | None = None,
+) -> Response:
+    """
+    Stream the given content back to the client in large zero-copy chunks, honoring
+    single and multiple byte ranges if requested.
+
+    If an entity tag is given, ranges are only honored if `If-Range` is absent or
+    matches it, so that a resumed download never splices together two versions.
+    """
+    content = memoryview(content).cast("B")
+    size = len(content)
+    headers = {**(headers or {}), "Accept-Ranges": "bytes"}
+    if etag:
+        headers["ETag"] = etag
+        if if_range is not None and if_range != etag:
+            range_header = None
+
+    ranges = parse_ranges(range_header, size)
+    if ranges is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            slices(content, 0, size - 1, chunk_size),
+            media_type=media_type,
+            headers=headers,
+        )
+
+    if not ranges:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers=headers,
+        )
+
+    if len(ranges) == 1:
+        ((start, end),) = ranges
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            slices(content, start, end, chunk_size),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=media_type,
+            headers=headers,
+        )
+
+    # multiple ranges are sent as a multipart/byteranges body. every part header is
+    # built upfront so that the total length is known before streaming
+    boundary = token_hex(16)
+    part_headers = [
+        (
+            f"--{boundary}\r\n"
+            f"Content-Type: {media_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode()
+        for start, end in ranges
+    ]
+    # every part but the first is preceded by the CRLF that ends the previous one
+    part_headers[1:] = [b"\r\n" + header for header in part_headers[1:]]
+    closing = f"\r\n--{boundary}--\r\n".encode()
+    headers["Content-Length"] = str(
+        sum(len(header) for header in part_headers)
+        + sum(end - start + 1 for start, end in ranges)
+        + len(closing)
+    )
+    return StreamingResponse(
+        _multipart(content, ranges, part_headers, closing, chunk_size),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers=headers,
+    )
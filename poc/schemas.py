@@ -0,0 +1,132 @@
+"""
+Response schemas for the entities the API hands out.
+
+Schemas are validated straight from ORM objects and result rows by attribute. Each
+one compiles its validator and serializer once, when it is defined, so responses
+don't go through the per-object reflection of `jsonable_encoder`.
+"""
+
+from base64 import b64decode
+from datetime import datetime
+from typing import Annotated
+
+from pydantic import (
+    BaseModel,
+    BeforeValidator,
+    ConfigDict,
+    PlainSerializer,
+    WithJsonSchema,
+)
+
+from .serialization import encode_bytes
+
+
+def _decode_bytes(value: object) -> object:
+    # key material arrives base64 encoded, with or without padding
+    if isinstance(value, str):
+        return b64decode(value + "=" * (-len(value) % 4), validate=True)
+    return value
+
+
+# key material: raw bytes, exchanged as base64 in JSON and forms
+Binary = Annotated[
+    bytes,
+    BeforeValidator(_decode_bytes),
+    PlainSerializer(encode_bytes, return_type=str, when_used="json"),
+    WithJsonSchema({"type": "string", "contentEncoding": "base64"}),
+]
+
+
+class Schema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+
+class UserSchema(Schema):
+    """User schema: everything about a user, for themselves"""
+
+    id: int
+    email: str
+    encryption_key: Binary
+    encryption_key_salt: Binary
+    private_group_id: int | None
+
+
+class PublicUserSchema(Schema):
+    """PublicUser schema: the parts of a user anyone may see"""
+
+    id: int
+    email: str
+    encryption_key: Binary
+
+
+class GroupSchema(Schema):
+    """Group schema"""
+
+    id: int
+    name: str
+    host_user_id: int | None
+    private: bool
+
+
+class GroupingSchema(Schema):
+    """Grouping schema"""
+
+    id: int
+    user_id: int
+    group_id: int
+    encryption_key: Binary
+
+
+class MembershipSchema(Schema):
+    """Membership schema: a group a user belongs to, and their grouping with it"""
+
+    group: GroupSchema
+    grouping: GroupingSchema
+
+
+class SharingSchema(Schema):
+    """Sharing schema"""
+
+    id: int
+    group_id: int
+    item_id: int
+    encryption_key: Binary
+    encryption_key_nonce: Binary
+
+
+class ItemSchema(Schema):
+    """Item schema: an item's metadata, without its content"""
+
+    id: int
+    content_nonce: Binary | None
+    size: int
+    digest: str | None
+    created_at: datetime
+    updated_at: datetime
+    segment_size: int | None
+
+
+class SegmentSchema(Schema):
+    """Segment schema"""
+
+    index: int
+    nonce: Binary
+    size: int
+    digest: str
+
+
+class VariantSchema(Schema):
+    """Variant schema"""
+
+    name: str
+    nonce: Binary
+    size: int
+    digest: str
+
+
+class FeedItemSchema(ItemSchema):
+    """FeedItem schema: an item's metadata, and the sharing it is visible through"""
+
+    group_id: int
+    encryption_key: Binary
+    encryption_key_nonce: Binary
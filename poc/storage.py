@@ -0,0 +1,264 @@
+import mmap
+import os
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterable, AsyncIterator
+from functools import cache
+from hashlib import sha256
+from pathlib import Path
+from secrets import token_hex
+from typing import Annotated, Self
+
+from fastapi import Depends, HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+
+BLOB_ROOT = "blobs"
+
+# size of the chunks read from uploads while they are written to the store
+INGEST_CHUNK_SIZE: int = 1024 * 1024
+
+# largest encrypted content accepted for a single blob
+MAX_BLOB_SIZE: int = 2 * 1024 * 1024 * 1024
+
+
+class BlobWriter(ABC):
+    """
+    An in-progress blob write. Content is written incrementally and only becomes
+    visible in the store once committed.
+    """
+
+    def __init__(self) -> None:
+        self._hash = sha256()
+        self.size: int = 0
+
+    def write(self, chunk: bytes) -> None:
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        self._write(chunk)
+
+    @property
+    def digest(self) -> str:
+        return self._hash.hexdigest()
+
+    @abstractmethod
+    def _write(self, chunk: bytes) -> None: ...
+
+    @abstractmethod
+    def commit(self) -> str:
+        """Persist the written content and return its digest."""
+
+    @abstractmethod
+    def abort(self) -> None:
+        """Discard the written content."""
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, *_) -> None:
+        # anything not explicitly committed is thrown away
+        self.abort()
+
+
+class BlobStore(ABC):
+    """
+    Content-addressed storage for encrypted item content. Blobs are identified by the
+    hex-encoded sha256 digest of their bytes.
+    """
+
+    @abstractmethod
+    def writer(self) -> BlobWriter: ...
+
+    @abstractmethod
+    def open(self, digest: str) -> memoryview:
+        """Return a read-only view over the blob's content."""
+
+    @abstractmethod
+    def read(self, digest: str) -> bytes:
+        """Return a copy of the blob's content, holding on to nothing afterwards."""
+
+    @abstractmethod
+    def delete(self, digest: str) -> None: ...
+
+    @abstractmethod
+    def create_partial(self, key: str, size: int) -> None:
+        """Reserve space for a blob that will be written out of order in parts."""
+
+    @abstractmethod
+    def write_partial(self, key: str, offset: int, chunk: bytes) -> None: ...
+
+    @abstractmethod
+    def commit_partial(self, key: str) -> tuple[str, int]:
+        """Add a fully written partial blob to the store, returning its digest and
+        size. the partial blob is kept until it is deleted, so that a commit can be
+        retried if whatever refers to the blob fails to be recorded."""
+
+    @abstractmethod
+    def delete_partial(self, key: str) -> None: ...
+
+    def put(self, data: bytes) -> str:
+        with self.writer() as writer:
+            writer.write(data)
+            return writer.commit()
+
+
+class LocalBlobWriter(BlobWriter):
+    def __init__(self, store: "LocalBlobStore") -> None:
+        super().__init__()
+        self._store = store
+        self._tmp = store.root / "tmp" / token_hex(16)
+        self._file = open(self._tmp, "xb")
+
+    def _write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+
+    def commit(self) -> str:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+        # renaming within the same filesystem is atomic, so readers either see the
+        # whole blob or nothing at all. identical content lands on the same path
+        path = self._store.path(self.digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self._tmp, path)
+        return self.digest
+
+    def abort(self) -> None:
+        self._file.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Blob store backed by the local filesystem. Blobs are sharded into two levels of
+    directories by digest prefix to keep directory sizes manageable.
+    """
+
+    def __init__(self, root: str | os.PathLike[str]) -> None:
+        self.root = Path(root)
+        (self.root / "tmp").mkdir(parents=True, exist_ok=True)
+        (self.root / "partial").mkdir(parents=True, exist_ok=True)
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def writer(self) -> LocalBlobWriter:
+        return LocalBlobWriter(self)
+
+    def open(self, digest: str) -> memoryview:
+        with open(self.path(digest), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # empty files cannot be mapped
+                return memoryview(b"")
+
+            # the mapping holds a duplicate of the file descriptor, and both are only
+            # released along with the last view over it. keep views short-lived
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def read(self, digest: str) -> bytes:
+        with open(self.path(digest), "rb") as f:
+            return f.read()
+
+    def delete(self, digest: str) -> None:
+        self.path(digest).unlink(missing_ok=True)
+
+    def _partial_path(self, key: str) -> Path:
+        return self.root / "partial" / key
+
+    def create_partial(self, key: str, size: int) -> None:
+        # a sparse file, so that parts can land at any offset in any order
+        with open(self._partial_path(key), "xb") as f:
+            f.truncate(size)
+
+    def write_partial(self, key: str, offset: int, chunk: bytes) -> None:
+        # every writer has its own descriptor and positioned writes don't share a file
+        # offset, so parts can be written concurrently
+        fd = os.open(self._partial_path(key), os.O_WRONLY)
+        try:
+            os.pwrite(fd, chunk, offset)
+        finally:
+            os.close(fd)
+
+    def commit_partial(self, key: str) -> tuple[str, int]:
+        path = self._partial_path(key)
+        content_hash, size = sha256(), 0
+        with open(path, "rb") as f:
+            while chunk := f.read(INGEST_CHUNK_SIZE):
+                content_hash.update(chunk)
+                size += len(chunk)
+            os.fsync(f.fileno())
+
+        digest = content_hash.hexdigest()
+        self.path(digest).parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, self.path(digest))
+        except FileExistsError:
+            # the store already holds the same content
+            pass
+        return digest, size
+
+    def delete_partial(self, key: str) -> None:
+        self._partial_path(key).unlink(missing_ok=True)
+
+
+async def iter_upload(
+    upload: UploadFile, chunk_size: int = INGEST_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    while chunk := await upload.read(chunk_size):
+        yield chunk
+
+
+async def ingest(
+    chunks: AsyncIterable[bytes], blobs: BlobStore, max_size: int = MAX_BLOB_SIZE
+) -> tuple[str, int]:
+    """
+    Stream chunks of content into the store, hashing and measuring them on the fly,
+    and return the digest and size of the stored blob. Only a single chunk is ever
+    held in memory, and the write is abandoned as soon as it exceeds the maximum size.
+    """
+    writer = await run_in_threadpool(blobs.writer)
+    try:
+        async for chunk in chunks:
+            if writer.size + len(chunk) > max_size:
+                raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await run_in_threadpool(writer.write, chunk)
+
+        return await run_in_threadpool(writer.commit), writer.size
+    finally:
+        await run_in_threadpool(writer.abort)
+
+
+async def ingest_partial(
+    chunks: AsyncIterable[bytes], blobs: BlobStore, key: str, offset: int, end: int
+) -> int:
+    """
+    Stream chunks of content into a partial blob starting at the given offset, and
+    return the number of bytes written. Writes are batched into bounded buffers, and
+    abandoned as soon as they run past the end of the blob.
+    """
+    buffer, position = bytearray(), offset
+    async for chunk in chunks:
+        if position + len(buffer) + len(chunk) > end:
+            raise HTTPException(status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+        buffer += chunk
+        if len(buffer) >= INGEST_CHUNK_SIZE:
+            await run_in_threadpool(blobs.write_partial, key, position, bytes(buffer))
+            position += len(buffer)
+            buffer.clear()
+
+    if buffer:
+        await run_in_threadpool(blobs.write_partial, key, position, bytes(buffer))
+        position += len(buffer)
+    return position - offset
+
+
+@cache
+def create_blob_store(root: str) -> BlobStore:
+    return LocalBlobStore(root)
+
+
+async def _dependency():
+    return create_blob_store(BLOB_ROOT)
+
+
+BlobStoreDependency = Annotated[BlobStore, Depends(_dependency)]
@@ -0,0 +1,32 @@
+from collections.abc import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+
+from .db import create_session
+from .serialization import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# rows fetched from the server-side cursor at a time. memory use is bounded by this,
+# however large the table
+STREAM_BATCH_SIZE: int = 1000
+
+
+async def _lines(statement: Select) -> AsyncIterator[bytes]:
+    # the response outlives the request's session, so the cursor gets its own
+    async with create_session() as session:
+        result = await session.stream(
+            statement.execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        async for rows in result.partitions():
+            yield b"".join(dumps(row._asdict()) + b"\n" for row in rows)
+
+
+def ndjson_response(statement: Select) -> StreamingResponse:
+    """
+    Stream every row of a query as newline-delimited JSON, reading it through a
+    server-side cursor. each batch is only fetched once the previous one has been
+    sent, so slow clients hold back the cursor instead of filling up memory.
+    """
+    return StreamingResponse(_lines(statement), media_type=NDJSON_MEDIA_TYPE)